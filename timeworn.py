@@ -1,580 +1,4174 @@
 #!/usr/bin/env python3
-import inkex
-import random
+import argparse
+import bisect
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import itertools
+import json
 import math
+import os
+import random
+import re
+import time
+
+import inkex
+import inkex.command
+from lxml import etree
+
+try:
+    import numpy as np
+except ImportError:  # Inkscape builds without NumPy fall back to pure Python
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed for image density maps
+    Image = None
 
 # Grid configuration
-GRID_CELL_SIZE_MM = 5.0
+GRID_CELL_SIZE_MM = 5.0  # default of --grid_cell_size
 GRID_SAMPLES_PER_CELL = 12
+GRID_SCANLINES_PER_CELL = 8
 FULL_CELL_COVERAGE_THRESHOLD = 0.9
+FULL_CELL_WEIGHT = 3.0
+MIN_PARTIAL_CELL_WEIGHT = 0.05
+QUADTREE_REFINE_LEVELS = 1
+
+# Geometry configuration
+TEXT_ELEMENT_TYPES = (inkex.TextElement, inkex.FlowRoot)
+OUTLINE_ELEMENT_TYPES = (
+    inkex.PathElement, inkex.Rectangle, inkex.Circle, inkex.Ellipse,
+    inkex.Polygon, inkex.Polyline, inkex.Line, inkex.Group
+) + TEXT_ELEMENT_TYPES
+BEZIER_FLATTEN_SEGMENTS = 8
+COLLINEAR_TOLERANCE = 1e-9  # relative to the outline's size
+BEZIER_MAX_SUBDIVISION_DEPTH = 12
+EDGE_INDEX_MAX_BANDS = 1024
+
+# Distribution configuration
+MAX_POINT_GENERATION_RETRIES = 50
+MAX_CLUSTER_POINT_ATTEMPTS = 50
+CLUSTER_MASK_RINGS = 8
+CLUSTER_MASK_SECTORS = 24
+POISSON_CANDIDATES_PER_POINT = 30
+POISSON_RESEED_CANDIDATES = 50
+POISSON_MIN_DENSITY = 1 / 16
+
+# Cache configuration
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+GEOMETRY_CACHE_VERSION = 6
+SPOTS_CACHE_VERSION = 6
+NON_SPOT_OPTIONS = {"tabs", "workers", "output_mode", "seed", "use_cache", "instrument", "stream_output", "input_file", "output"}
+
+# Output configuration
+SPOT_STYLE = {
+    'fill': '#000000',
+    'fill-opacity': '1',
+    'fill-rule': 'nonzero',
+    'stroke': 'none'
+}
+SPOT_COORDINATE_PRECISION = 3
+SPOT_CHUNK_SIZE = 4096
+
+# Attributes recording how a spots group was generated, for incremental re-runs
+SPOTS_SOURCE_ATTRIBUTE = "data-timeworn-source"
+SPOTS_VERSION_ATTRIBUTE = "data-timeworn-version"
+SPOTS_SEED_ATTRIBUTE = "data-timeworn-seed"
+SPOTS_BASE_SEED_ATTRIBUTE = "data-timeworn-base-seed"
+SPOTS_GEOMETRY_ATTRIBUTE = "data-timeworn-geometry"
+SPOTS_OPTIONS_ATTRIBUTE = "data-timeworn-options"
+SPOT_INDEX_ATTRIBUTE = "data-timeworn-spot"
+
+# Comment marking where streamed spots are written into the saved document
+STREAM_PLACEHOLDER = "timeworn-stream-{}"
+
+class FlattenedPath:
+    """Polygon outline bucketed into horizontal bands for fast ray casting.
+
+    Each non-horizontal edge is registered in every band its y-range
+    crosses, so a containment test only visits the edges that can
+    intersect the query scanline instead of the whole outline.
+    """
+
+    def __init__(
+        self,
+        line_segments: list[tuple[tuple[float, float], tuple[float, float]]],
+        rings: list[list[tuple[float, float]]] | None = None,
+        fill_rule: str = "evenodd",
+        components: list["FlattenedPath"] | None = None
+    ):
+        """Build the band index from a list of line segments.
+
+        Args:
+            line_segments: List of ((x0, y0), (x1, y1)) segments
+            rings: The same outline as closed point lists, one per subpath,
+                kept for polygon clipping
+            fill_rule: "evenodd", or "nonzero" for outlines whose rings are
+                oriented so the winding number counts covering shapes
+            components: Outlines of the separate shapes merged into this one
+                (see union())
+        """
+        self.rings = rings or []
+        self.fill_rule = fill_rule
+        self.components = components or []
+        self.analytic_shape = None
+
+        # Store edges bottom-up with their inverse slope and direction (horizontal
+        # edges never count as ray crossings and are only kept for grid rasterization)
+        self.edges = []
+        self.horizontal_edges = []
+        for (start_x, start_y), (end_x, end_y) in line_segments:
+            if start_y == end_y:
+                self.horizontal_edges.append((min(start_x, end_x), max(start_x, end_x), start_y))
+                continue
+            winding = 1
+            if start_y > end_y:
+                start_x, start_y, end_x, end_y = end_x, end_y, start_x, start_y
+                winding = -1
+            inverse_slope = (end_x - start_x) / (end_y - start_y)
+            self.edges.append((start_x, start_y, end_y, inverse_slope, winding))
+
+        self.build_index()
+
+    @classmethod
+    def union(cls, outlines: list["FlattenedPath"]) -> "FlattenedPath":
+        """Merge several outlines into one covering every point any of them covers.
+
+        Args:
+            outlines: Even-odd outlines with rings, e.g. the children of a group
+
+        Returns:
+            Nonzero outline whose components are the given outlines
+
+        Note:
+            The rings of each outline are oriented by nesting depth (outer
+            rings one way, holes the other), so each outline adds 0 or 1 to
+            the winding number and overlapping outlines still fill as one.
+        """
+        line_segments = []
+        oriented_rings = []
+        for outline in outlines:
+            for ring_index, ring in enumerate(outline.rings):
+                if len(ring) < 2:
+                    continue
+                depth = sum(
+                    1 for other_index, other in enumerate(outline.rings)
+                    if other_index != ring_index and len(other) >= 3 and ring_contains(other, *ring[0])
+                )
+                wanted_sign = 1 if depth % 2 == 0 else -1
+                if signed_area(ring) * wanted_sign < 0:
+                    ring = ring[::-1]
+                oriented_rings.append(ring)
+                line_segments.extend(zip(ring, ring[1:] + ring[:1]))
+        return cls(line_segments, oriented_rings, "nonzero", outlines)
+
+    def build_index(self) -> None:
+        """Bucket the edges into horizontal bands."""
+        if not self.edges:
+            self.y_min = self.y_max = 0.0
+            self.band_height = 1.0
+            self.bands = []
+            self.band_arrays = {}
+            return
+
+        self.y_min = min(edge[1] for edge in self.edges)
+        self.y_max = max(edge[2] for edge in self.edges)
+        band_count = max(1, min(EDGE_INDEX_MAX_BANDS, len(self.edges)))
+        self.band_height = (self.y_max - self.y_min) / band_count or 1.0
+
+        # Register each edge in every band its y-range overlaps
+        self.bands = [[] for _ in range(band_count)]
+        self.band_arrays = {}
+        for edge in self.edges:
+            first_band = self.band_index(edge[1])
+            last_band = self.band_index(edge[2])
+            for band in range(first_band, last_band + 1):
+                self.bands[band].append(edge)
+
+    def to_json(self) -> dict:
+        """Return the outline as a JSON-serializable dict (see from_json)."""
+        return {
+            "edges": self.edges,
+            "horizontal_edges": self.horizontal_edges,
+            "rings": self.rings,
+            "fill_rule": self.fill_rule,
+            "components": [component.to_json() for component in self.components],
+            "analytic_shape": self.analytic_shape
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "FlattenedPath":
+        """Rebuild a FlattenedPath from the output of to_json()."""
+        flattened_path = cls.__new__(cls)
+        flattened_path.edges = [tuple(edge) for edge in data["edges"]]
+        flattened_path.horizontal_edges = [tuple(edge) for edge in data["horizontal_edges"]]
+        flattened_path.rings = [[tuple(point) for point in ring] for ring in data["rings"]]
+        flattened_path.fill_rule = data["fill_rule"]
+        flattened_path.components = [cls.from_json(component) for component in data["components"]]
+        flattened_path.analytic_shape = data["analytic_shape"] and tuple(data["analytic_shape"])
+        flattened_path.build_index()
+        return flattened_path
+
+    def fingerprint(self) -> str:
+        """Return a hash identifying the outline geometry."""
+        return hashlib.sha256(
+            repr((self.edges, self.horizontal_edges, self.fill_rule, self.analytic_shape)).encode()
+        ).hexdigest()
+
+    def bounding_box(self) -> inkex.BoundingBox | None:
+        """Return the bounding box of the outline, or None if it is empty."""
+        points = [point for ring in self.rings for point in ring]
+        if not points:
+            return None
+        return inkex.BoundingBox(
+            (min(point[0] for point in points), max(point[0] for point in points)),
+            (min(point[1] for point in points), max(point[1] for point in points))
+        )
+
+    def encloses_area(self) -> bool:
+        """Return whether the outline encloses any area, i.e. its points are not all on one line."""
+        points = [point for ring in self.rings for point in ring]
+        if len(points) < 3:
+            return False
+        start_x, start_y = points[0]
+        end_x, end_y = max(points, key=lambda point: (point[0] - start_x) ** 2 + (point[1] - start_y) ** 2)
+        length = math.hypot(end_x - start_x, end_y - start_y)
+        if length == 0:
+            return False
+        return any(
+            abs((end_x - start_x) * (point_y - start_y) - (end_y - start_y) * (point_x - start_x))
+            > COLLINEAR_TOLERANCE * length * length
+            for point_x, point_y in points
+        )
+
+    def band_index(self, y: float) -> int:
+        """Return the index of the band containing y, clamped to the index range."""
+        band = int((y - self.y_min) / self.band_height)
+        return max(0, min(len(self.bands) - 1, band))
+
+    def contains(self, test_x: float, test_y: float) -> bool:
+        """Test if point is inside the outline using the outline's fill rule.
+
+        Args:
+            test_x: X coordinate of point to test
+            test_y: Y coordinate of point to test
+
+        Returns:
+            True if point is inside the outline, False otherwise
+        """
+        if self.analytic_shape is not None:
+            return self.analytic_contains(test_x, test_y)
+        return self.polygon_contains(test_x, test_y)
+
+    def polygon_contains(self, test_x: float, test_y: float) -> bool:
+        """Test if point is inside the flattened edges, ignoring analytic_shape.
+
+        Polygon clipping needs this test: its intersections lie on the
+        flattened rings, so inside/outside must be decided against the same
+        rings and not against the true curve.
+        """
+        if not self.bands or not (self.y_min < test_y <= self.y_max):
+            return False
+
+        intersection_count = 0
+        winding_number = 0
+        for start_x, start_y, end_y, inverse_slope, winding in self.bands[self.band_index(test_y)]:
+            # Check if ray intersects edge's y range
+            if not (start_y < test_y <= end_y):
+                continue
+
+            # Count if intersection is to the right of test point
+            if start_x + (test_y - start_y) * inverse_slope > test_x:
+                intersection_count += 1
+                winding_number += winding
+
+        if self.fill_rule == "nonzero":
+            return winding_number != 0
+        # Odd number of intersections = inside (even-odd rule)
+        return intersection_count % 2 == 1
+
+    def analytic_contains(self, test_x: float, test_y: float) -> bool:
+        """Test a point against the exact rectangle or ellipse in analytic_shape.
+
+        Note:
+            analytic_shape holds the shape kind, the six coefficients
+            (a, b, c, d, e, f) of the inverse of its composed transform and
+            the shape's own geometry:
+            (left, top, right, bottom) for "rect", (cx, cy, rx, ry) for
+            "ellipse". The point is mapped back into the shape's own
+            coordinates and tested there.
+        """
+        shape_kind, a, b, c, d, e, f, first, second, third, fourth = self.analytic_shape
+        local_x = a * test_x + c * test_y + e
+        local_y = b * test_x + d * test_y + f
+        if shape_kind == "rect":
+            return first <= local_x <= third and second <= local_y <= fourth
+        offset_x = (local_x - first) / third
+        offset_y = (local_y - second) / fourth
+        return offset_x * offset_x + offset_y * offset_y <= 1.0
+
+    def scanline_crossings(self, scan_y: float) -> list[float]:
+        """Return the sorted x coordinates where a scanline enters or leaves the shape.
+
+        Args:
+            scan_y: Y coordinate of the horizontal scanline
+
+        Returns:
+            Sorted crossing positions; consecutive pairs bound the inside spans
+            under the outline's fill rule
+        """
+        if not self.bands or not (self.y_min < scan_y <= self.y_max):
+            return []
+
+        crossings = [
+            (start_x + (scan_y - start_y) * inverse_slope, winding)
+            for start_x, start_y, end_y, inverse_slope, winding in self.bands[self.band_index(scan_y)]
+            if start_y < scan_y <= end_y
+        ]
+        crossings.sort()
+        if self.fill_rule != "nonzero":
+            return [crossing_x for crossing_x, winding in crossings]
+
+        # Keep only the crossings where the winding number leaves or returns to zero
+        span_bounds = []
+        winding_number = 0
+        for crossing_x, winding in crossings:
+            previous_winding_number = winding_number
+            winding_number += winding
+            if (previous_winding_number == 0) != (winding_number == 0):
+                span_bounds.append(crossing_x)
+        return span_bounds
+
+    def contains_many(self, xs, ys):
+        """Test a batch of points against the outline using the outline's fill rule.
+
+        Args:
+            xs: Sequence of X coordinates
+            ys: Sequence of Y coordinates (same length as xs)
+
+        Returns:
+            Boolean mask (NumPy array, or list without NumPy) marking inside points
+
+        Note:
+            With NumPy, points are grouped by band and each group is tested
+            against that band's edge arrays with broadcasting. Rectangles
+            and ellipses are tested analytically in one pass.
+        """
+        if np is None:
+            return [self.contains(test_x, test_y) for test_x, test_y in zip(xs, ys)]
+
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        if self.analytic_shape is not None:
+            shape_kind, a, b, c, d, e, f, first, second, third, fourth = self.analytic_shape
+            local_xs = a * xs + c * ys + e
+            local_ys = b * xs + d * ys + f
+            if shape_kind == "rect":
+                return (first <= local_xs) & (local_xs <= third) & (second <= local_ys) & (local_ys <= fourth)
+            return ((local_xs - first) / third) ** 2 + ((local_ys - second) / fourth) ** 2 <= 1.0
+
+        inside = np.zeros(len(xs), dtype=bool)
+        if not self.bands:
+            return inside
+
+        # Only points within the outline's y-range can be inside
+        candidates = np.nonzero((ys > self.y_min) & (ys <= self.y_max))[0]
+        if not len(candidates):
+            return inside
+
+        # Group candidate points by band
+        point_bands = ((ys[candidates] - self.y_min) / self.band_height).astype(int)
+        point_bands = np.clip(point_bands, 0, len(self.bands) - 1)
+        order = np.argsort(point_bands, kind="stable")
+        candidates = candidates[order]
+        point_bands = point_bands[order]
+        group_starts = np.flatnonzero(np.diff(point_bands)) + 1
+        group_bounds = zip(
+            np.concatenate(([0], group_starts)),
+            np.concatenate((group_starts, [len(candidates)]))
+        )
+
+        for group_start, group_end in group_bounds:
+            start_x, start_y, end_y, inverse_slope, winding = self.band_edge_arrays(
+                int(point_bands[group_start])
+            )
+            if not len(start_x):
+                continue
+
+            point_indices = candidates[group_start:group_end]
+            test_x = xs[point_indices][:, None]
+            test_y = ys[point_indices][:, None]
+
+            # Same crossing test as contains(), broadcast over points x edges
+            crossings = (
+                (start_y < test_y)
+                & (test_y <= end_y)
+                & (start_x + (test_y - start_y) * inverse_slope > test_x)
+            )
+            if self.fill_rule == "nonzero":
+                inside[point_indices] = (crossings * winding).sum(axis=1) != 0
+            else:
+                inside[point_indices] = crossings.sum(axis=1) % 2 == 1
+
+        return inside
+
+    def band_edge_arrays(self, band: int):
+        """Return (start_x, start_y, end_y, inverse_slope, winding) arrays for a band, built lazily."""
+        arrays = self.band_arrays.get(band)
+        if arrays is None:
+            columns = list(zip(*self.bands[band])) or [(), (), (), (), ()]
+            arrays = tuple(np.array(column, dtype=float) for column in columns)
+            self.band_arrays[band] = arrays
+        return arrays
+
+
+class CoverageGrid:
+    """Classification of the shape's bounding box into fixed-size cells.
+
+    ``states`` holds 0=empty, 1=partial, 2=full per cell and ``coverage``
+    the fraction of each cell's area inside the shape, both indexed as
+    [row][col].
+    """
+
+    def __init__(
+        self,
+        x_min: float,
+        y_min: float,
+        cols: int,
+        rows: int,
+        cell_width: float,
+        cell_height: float
+    ):
+        self.x_min = x_min
+        self.y_min = y_min
+        self.cols = cols
+        self.rows = rows
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.states = [[0 for _ in range(cols)] for _ in range(rows)]
+        self.coverage = [[0.0 for _ in range(cols)] for _ in range(rows)]
+        self.exact_coverage = False
+
+    def to_json(self) -> dict:
+        """Return the grid as a JSON-serializable dict (see from_json)."""
+        return {
+            "origin": [self.x_min, self.y_min],
+            "size": [self.cols, self.rows],
+            "cell_size": [self.cell_width, self.cell_height],
+            "states": self.states,
+            "coverage": self.coverage,
+            "exact_coverage": self.exact_coverage
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "CoverageGrid":
+        """Rebuild a CoverageGrid from the output of to_json()."""
+        coverage_grid = cls(*data["origin"], *data["size"], *data["cell_size"])
+        coverage_grid.states = data["states"]
+        coverage_grid.coverage = data["coverage"]
+        coverage_grid.exact_coverage = data["exact_coverage"]
+        return coverage_grid
+
+    @property
+    def nominal_cell_size(self) -> float:
+        """Size of a grid cell, used to bucket outline edges (see OutlineClipper)."""
+        return max(self.cell_width, self.cell_height)
+
+    def cells_with_state(self, *states: int) -> list[tuple[int, int]]:
+        """Return (row, col) of every cell whose state is one of the given states."""
+        return [
+            (row_index, col_index)
+            for row_index in range(self.rows)
+            for col_index in range(self.cols)
+            if self.states[row_index][col_index] in states
+        ]
+
+    def cell_state(self, cell: tuple[int, int]) -> int:
+        """Return the state of a cell given as (row, col)."""
+        return self.states[cell[0]][cell[1]]
+
+    def cell_coverage(self, cell: tuple[int, int]) -> float:
+        """Return the fraction of a cell's area inside the shape."""
+        return self.coverage[cell[0]][cell[1]]
+
+    def cell_area(self, cell: tuple[int, int]) -> float:
+        """Return the area of a cell relative to the nominal cell (always 1)."""
+        return 1.0
+
+    def cell_box(self, cell: tuple[int, int]) -> tuple[float, float, float, float]:
+        """Return (x_min, y_min, x_max, y_max) of a cell given as (row, col)."""
+        cell_x = self.x_min + cell[1] * self.cell_width
+        cell_y = self.y_min + cell[0] * self.cell_height
+        return cell_x, cell_y, cell_x + self.cell_width, cell_y + self.cell_height
+
+    def state_at(self, point_x: float, point_y: float) -> int:
+        """Return the state of the cell containing a point (0 outside the grid)."""
+        col_index = math.floor((point_x - self.x_min) / self.cell_width)
+        row_index = math.floor((point_y - self.y_min) / self.cell_height)
+        if 0 <= col_index < self.cols and 0 <= row_index < self.rows:
+            return self.states[row_index][col_index]
+        return 0
+
+    def is_full(self, box: tuple[float, float, float, float]) -> bool:
+        """Return True if a box lies entirely in full cells of an exact grid.
+
+        Args:
+            box: (x_min, y_min, x_max, y_max) to test
+        """
+        if not self.exact_coverage:
+            return False
+        first_col = math.floor((box[0] - self.x_min) / self.cell_width)
+        last_col = math.floor((box[2] - self.x_min) / self.cell_width)
+        first_row = math.floor((box[1] - self.y_min) / self.cell_height)
+        last_row = math.floor((box[3] - self.y_min) / self.cell_height)
+        return (
+            first_col >= 0 and first_row >= 0 and last_col < self.cols and last_row < self.rows
+            and all(
+                self.states[row_index][col_index] == 2
+                for row_index in range(first_row, last_row + 1)
+                for col_index in range(first_col, last_col + 1)
+            )
+        )
+
+    def random_point_in_cell(
+        self,
+        cell: tuple[int, int],
+        rng: random.Random
+    ) -> tuple[float, float]:
+        """Return a uniformly distributed point inside a cell given as (row, col)."""
+        row_index, col_index = cell
+        return (
+            self.x_min + col_index * self.cell_width + rng.uniform(0, self.cell_width),
+            self.y_min + row_index * self.cell_height + rng.uniform(0, self.cell_height)
+        )
+
+
+class CoverageQuadtree:
+    """Adaptive classification of the shape's bounding square into quadtree nodes.
+
+    Nodes crossed by the outline are split into four until they reach the
+    minimum size; nodes the outline does not cross stay whole, however
+    large, and are entirely full or empty. The leaves play the role of the
+    cells of a CoverageGrid (same states and coverage fractions, same
+    methods), identified by their node index, so their number grows with
+    the length of the outline instead of the area of the shape.
+
+    Nodes are stored in flat lists indexed by node, the root being node 0:
+    ``children`` holds the index of a node's first child (its four children
+    are consecutive, in the order top-left, top-right, bottom-left,
+    bottom-right) or 0 for leaves.
+    """
+
+    def __init__(self, x_min: float, y_min: float, size: float, nominal_cell_size: float):
+        """Create a quadtree made of a single empty root node.
+
+        Args:
+            x_min: Left edge of the root square
+            y_min: Top edge of the root square
+            size: Side of the root square
+            nominal_cell_size: Cell size of the fixed grid this tree replaces
+        """
+        self.x_min = x_min
+        self.y_min = y_min
+        self.size = size
+        self.nominal_cell_size = nominal_cell_size
+        self.children = [0]
+        self.states = [0]
+        self.coverage = [0.0]
+        self.node_boxes = [(x_min, y_min, size)]
+        self.exact_coverage = True
+
+    def split(self, node: int) -> int:
+        """Split a leaf into four children and return the index of the first one."""
+        node_x, node_y, node_size = self.node_boxes[node]
+        half_size = node_size / 2
+        first_child = len(self.children)
+        self.children[node] = first_child
+        self.states[node] = 1
+        for child_y in (node_y, node_y + half_size):
+            for child_x in (node_x, node_x + half_size):
+                self.children.append(0)
+                self.states.append(0)
+                self.coverage.append(0.0)
+                self.node_boxes.append((child_x, child_y, half_size))
+        return first_child
+
+    def to_json(self) -> dict:
+        """Return the tree as a JSON-serializable dict (see from_json)."""
+        return {
+            "origin": [self.x_min, self.y_min],
+            "size": self.size,
+            "nominal_cell_size": self.nominal_cell_size,
+            "children": self.children,
+            "states": self.states,
+            "coverage": self.coverage
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "CoverageQuadtree":
+        """Rebuild a CoverageQuadtree from the output of to_json()."""
+        coverage_tree = cls(*data["origin"], data["size"], data["nominal_cell_size"])
+        coverage_tree.children = data["children"]
+        coverage_tree.states = data["states"]
+        coverage_tree.coverage = data["coverage"]
+
+        # Node boxes follow from the root square and the children links
+        node_boxes = [None] * len(coverage_tree.children)
+        node_boxes[0] = (coverage_tree.x_min, coverage_tree.y_min, coverage_tree.size)
+        for node, first_child in enumerate(coverage_tree.children):
+            if first_child:
+                node_x, node_y, node_size = node_boxes[node]
+                half_size = node_size / 2
+                for quadrant in range(4):
+                    node_boxes[first_child + quadrant] = (
+                        node_x + half_size * (quadrant % 2), node_y + half_size * (quadrant // 2), half_size
+                    )
+        coverage_tree.node_boxes = node_boxes
+        return coverage_tree
+
+    def cells_with_state(self, *states: int) -> list[int]:
+        """Return the node index of every leaf whose state is one of the given states."""
+        return [
+            node for node, first_child in enumerate(self.children)
+            if not first_child and self.states[node] in states
+        ]
+
+    def cell_state(self, cell: int) -> int:
+        """Return the state of a leaf."""
+        return self.states[cell]
+
+    def cell_coverage(self, cell: int) -> float:
+        """Return the fraction of a leaf's area inside the shape."""
+        return self.coverage[cell]
+
+    def cell_area(self, cell: int) -> float:
+        """Return the area of a leaf relative to a cell of the nominal size."""
+        return (self.node_boxes[cell][2] / self.nominal_cell_size) ** 2
+
+    def cell_box(self, cell: int) -> tuple[float, float, float, float]:
+        """Return (x_min, y_min, x_max, y_max) of a leaf."""
+        node_x, node_y, node_size = self.node_boxes[cell]
+        return node_x, node_y, node_x + node_size, node_y + node_size
+
+    def subdivided(self) -> "CoverageQuadtree":
+        """Return a copy whose full leaves are split down to the size of the partial leaves.
+
+        Note:
+            Used when spots follow a density map, which is then sampled at
+            the same resolution over the whole shape. The children of a
+            full leaf are full.
+        """
+        coverage_tree = CoverageQuadtree(self.x_min, self.y_min, self.size, self.nominal_cell_size)
+        coverage_tree.children = list(self.children)
+        coverage_tree.states = list(self.states)
+        coverage_tree.coverage = list(self.coverage)
+        coverage_tree.node_boxes = list(self.node_boxes)
+
+        min_cell_size = self.nominal_cell_size / 2 ** QUADTREE_REFINE_LEVELS
+        pending_nodes = [
+            node for node in self.cells_with_state(2) if self.node_boxes[node][2] > min_cell_size
+        ]
+        while pending_nodes:
+            node = pending_nodes.pop()
+            first_child = coverage_tree.split(node)
+            for child in range(first_child, first_child + 4):
+                coverage_tree.states[child] = 2
+                coverage_tree.coverage[child] = 1.0
+                if coverage_tree.node_boxes[child][2] > min_cell_size:
+                    pending_nodes.append(child)
+        return coverage_tree
+
+    def state_at(self, point_x: float, point_y: float) -> int:
+        """Return the state of the leaf containing a point (0 outside the tree)."""
+        node_x, node_y, node_size = self.x_min, self.y_min, self.size
+        if not (node_x <= point_x < node_x + node_size and node_y <= point_y < node_y + node_size):
+            return 0
+        node = 0
+        while self.children[node]:
+            node_size /= 2
+            right = point_x >= node_x + node_size
+            bottom = point_y >= node_y + node_size
+            node_x += node_size * right
+            node_y += node_size * bottom
+            node = self.children[node] + 2 * bottom + right
+        return self.states[node]
+
+    def is_full(self, box: tuple[float, float, float, float]) -> bool:
+        """Return True if a box lies entirely in full leaves.
+
+        Args:
+            box: (x_min, y_min, x_max, y_max) to test
+        """
+        if not (
+            self.x_min <= box[0] and box[2] < self.x_min + self.size
+            and self.y_min <= box[1] and box[3] < self.y_min + self.size
+        ):
+            return False
+
+        pending_nodes = [0]
+        while pending_nodes:
+            node = pending_nodes.pop()
+            node_x, node_y, node_size = self.node_boxes[node]
+            if box[2] < node_x or box[0] >= node_x + node_size or box[3] < node_y or box[1] >= node_y + node_size:
+                continue
+            first_child = self.children[node]
+            if first_child:
+                pending_nodes.extend(range(first_child, first_child + 4))
+            elif self.states[node] != 2:
+                return False
+        return True
+
+    def random_point_in_cell(self, cell: int, rng: random.Random) -> tuple[float, float]:
+        """Return a uniformly distributed point inside a leaf."""
+        node_x, node_y, node_size = self.node_boxes[cell]
+        return node_x + rng.uniform(0, node_size), node_y + rng.uniform(0, node_size)
+
+
+class WeightedSampler:
+    """Walker/Vose alias table for O(1) weighted random draws.
+
+    Built once from a list of items and non-negative weights; each draw
+    then costs one random index and one random comparison regardless of
+    the number of items.
+    """
+
+    def __init__(self, items: list, weights: list[float]):
+        """Build the alias table.
+
+        Args:
+            items: Items to draw from
+            weights: Relative weight of each item (zero-weight items are never drawn)
+        """
+        self.items = []
+        scaled_weights = []
+        for item, weight in zip(items, weights):
+            if weight > 0:
+                self.items.append(item)
+                scaled_weights.append(weight)
+
+        item_count = len(self.items)
+        self.probabilities = [1.0] * item_count
+        self.aliases = list(range(item_count))
+        if not item_count:
+            return
+
+        # Scale weights so the average is 1, then pair small and large entries
+        weight_scale = item_count / sum(scaled_weights)
+        scaled_weights = [weight * weight_scale for weight in scaled_weights]
+        small = [index for index, weight in enumerate(scaled_weights) if weight < 1.0]
+        large = [index for index, weight in enumerate(scaled_weights) if weight >= 1.0]
+        while small and large:
+            small_index = small.pop()
+            large_index = large[-1]
+            self.probabilities[small_index] = scaled_weights[small_index]
+            self.aliases[small_index] = large_index
+            scaled_weights[large_index] -= 1.0 - scaled_weights[small_index]
+            if scaled_weights[large_index] < 1.0:
+                small.append(large.pop())
+
+        # Leftovers are 1.0 up to rounding error
+        for index in small + large:
+            self.probabilities[index] = 1.0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def sample(self, rng: random.Random):
+        """Draw one item with probability proportional to its weight."""
+        index = rng.randrange(len(self.items))
+        if rng.random() < self.probabilities[index]:
+            return self.items[index]
+        return self.items[self.aliases[index]]
+
+
+class DensityField:
+    """Relative spot density over the shape's bounding box, as a raster.
+
+    ``values`` holds a density between 0 and 1 per raster cell, indexed as
+    [row][col]. The raster is stretched over the bounding box, and points
+    outside it take the density of the nearest cell.
+    """
+
+    def __init__(
+        self,
+        x_min: float,
+        y_min: float,
+        cell_width: float,
+        cell_height: float,
+        values: list[list[float]]
+    ):
+        self.x_min = x_min
+        self.y_min = y_min
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.values = values
+        self.rows = len(values)
+        self.cols = len(values[0])
+
+    def value_at(self, point_x: float, point_y: float) -> float:
+        """Return the density of the raster cell containing a point."""
+        col_index = min(max(math.floor((point_x - self.x_min) / self.cell_width), 0), self.cols - 1)
+        row_index = min(max(math.floor((point_y - self.y_min) / self.cell_height), 0), self.rows - 1)
+        return self.values[row_index][col_index]
+
+    def mean_in_box(self, box: tuple[float, float, float, float]) -> float:
+        """Return the mean density of the raster cells whose centers lie in a box.
+
+        Args:
+            box: (x_min, y_min, x_max, y_max)
+
+        Note:
+            Boxes too small to contain a cell center take the density at
+            their own center.
+        """
+        first_col = max(0, math.ceil((box[0] - self.x_min) / self.cell_width - 0.5))
+        last_col = min(self.cols, math.ceil((box[2] - self.x_min) / self.cell_width - 0.5)) - 1
+        first_row = max(0, math.ceil((box[1] - self.y_min) / self.cell_height - 0.5))
+        last_row = min(self.rows, math.ceil((box[3] - self.y_min) / self.cell_height - 0.5)) - 1
+        if first_col > last_col or first_row > last_row:
+            return self.value_at((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+        total = sum(
+            sum(self.values[row_index][first_col:last_col + 1])
+            for row_index in range(first_row, last_row + 1)
+        )
+        return total / ((last_col - first_col + 1) * (last_row - first_row + 1))
+
+
+class SpatialHash:
+    """Grid-bucketed set of discs for constant-time spacing queries.
+
+    Each disc has its own clearance radius; two discs conflict when their
+    centers are closer than the sum of their radii, that is when the discs
+    overlap. A disc is stored in every bucket its bounding square touches,
+    so a query only looks at the buckets its own disc touches: with a
+    bucket size of at least the largest diameter, at most 2x2 of them.
+    Larger discs (see generate_poisson_points() with a density map) touch
+    more buckets but stay correct.
+    """
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.buckets = {}
+
+    def bucket_keys(self, point_x: float, point_y: float, radius: float) -> list[tuple[int, int]]:
+        """Return the keys of the buckets touched by a disc's bounding square."""
+        cell_size = self.cell_size
+        col_range = range(math.floor((point_x - radius) / cell_size), math.floor((point_x + radius) / cell_size) + 1)
+        row_range = range(math.floor((point_y - radius) / cell_size), math.floor((point_y + radius) / cell_size) + 1)
+        return [(bucket_col, bucket_row) for bucket_col in col_range for bucket_row in row_range]
+
+    def add(self, point_x: float, point_y: float, radius: float) -> None:
+        """Insert a disc."""
+        for key in self.bucket_keys(point_x, point_y, radius):
+            self.buckets.setdefault(key, []).append((point_x, point_y, radius))
+
+    def is_free(self, point_x: float, point_y: float, radius: float) -> bool:
+        """Return True if a disc at this position conflicts with no inserted disc."""
+        for key in self.bucket_keys(point_x, point_y, radius):
+            for other_x, other_y, other_radius in self.buckets.get(key, ()):
+                min_distance = radius + other_radius
+                if (point_x - other_x) ** 2 + (point_y - other_y) ** 2 < min_distance * min_distance:
+                    return False
+        return True
+
+
+class ClipNode:
+    """Vertex of a polygon in a Greiner-Hormann doubly linked list."""
+
+    __slots__ = ("x", "y", "next", "prev", "alpha", "intersect", "entry", "neighbor", "visited")
+
+    def __init__(self, x: float, y: float, alpha: float = 0.0, intersect: bool = False):
+        self.x = x
+        self.y = y
+        self.next = None
+        self.prev = None
+        self.alpha = alpha
+        self.intersect = intersect
+        self.entry = False
+        self.neighbor = None
+        self.visited = False
+
+
+class OutlineClipper:
+    """Clips small polygons (spots) against the rings of a flattened outline.
+
+    Uses the Greiner-Hormann algorithm generalized to an even-odd clip
+    region made of several rings. Outlines merged from several shapes
+    (FlattenedPath.union()) are clipped against each shape separately.
+    Outline edges are bucketed on a square grid so each spot is only
+    intersected with the edges near it, and the coverage grid tells which
+    spots lie entirely inside the shape and can skip clipping altogether.
+    """
+
+    def __init__(self, flattened_path: FlattenedPath, coverage_grid: CoverageGrid):
+        self.flattened_path = flattened_path
+        self.coverage_grid = coverage_grid
+        self.bucket_size = coverage_grid.nominal_cell_size
+        self.parts = flattened_path.components or [flattened_path]
+
+        # Rings without repeated points, bucketed edge by edge
+        self.rings = []
+        self.ring_parts = []
+        self.edge_buckets = {}
+        for part_index, part in enumerate(self.parts):
+            for ring in part.rings:
+                self.add_ring(ring, part_index)
+
+    def add_ring(self, ring: list[tuple[float, float]], part_index: int) -> None:
+        """Register a ring of one part of the outline in the edge buckets."""
+        clean_ring = [point for point, previous in zip(ring, ring[-1:] + ring[:-1]) if point != previous]
+        if len(clean_ring) < 3:
+            return
+        ring_index = len(self.rings)
+        self.rings.append(clean_ring)
+        self.ring_parts.append(part_index)
+        for edge_index, (start_point, end_point) in enumerate(zip(clean_ring, clean_ring[1:] + clean_ring[:1])):
+            first_col, first_row = self.bucket_key(min(start_point[0], end_point[0]), min(start_point[1], end_point[1]))
+            last_col, last_row = self.bucket_key(max(start_point[0], end_point[0]), max(start_point[1], end_point[1]))
+            for bucket_col in range(first_col, last_col + 1):
+                for bucket_row in range(first_row, last_row + 1):
+                    self.edge_buckets.setdefault((bucket_col, bucket_row), []).append((ring_index, edge_index))
+
+    def bucket_key(self, point_x: float, point_y: float) -> tuple[int, int]:
+        return math.floor(point_x / self.bucket_size), math.floor(point_y / self.bucket_size)
+
+    def locate(self, box: tuple[float, float, float, float], point_x: float, point_y: float) -> int:
+        """Classify a polygon against the shape from its bounding box.
+
+        Args:
+            box: (x_min, y_min, x_max, y_max) of the polygon
+            point_x: X coordinate of any point of the polygon
+            point_y: Y coordinate of any point of the polygon
+
+        Returns:
+            2 if the polygon is entirely inside the shape, 0 if entirely
+            outside, 1 if the outline may cross it (same values as grid cells)
+
+        Note:
+            Boxes lying in full cells of an exact coverage grid are inside
+            without further tests. Otherwise, a box no outline edge overlaps
+            is inside or outside as a whole, decided by ray casting one point
+            against the flattened rings.
+        """
+        if self.coverage_grid.is_full(box):
+            return 2
+
+        if self.edges_near(box):
+            return 1
+        return 2 if self.flattened_path.polygon_contains(point_x, point_y) else 0
+
+    def edges_near(self, box: tuple[float, float, float, float]) -> list[tuple[int, int]]:
+        """Return (ring_index, edge_index) of the outline edges whose bounding box overlaps box."""
+        first_col, first_row = self.bucket_key(box[0], box[1])
+        last_col, last_row = self.bucket_key(box[2], box[3])
+        candidate_edges = set()
+        for bucket_col in range(first_col, last_col + 1):
+            for bucket_row in range(first_row, last_row + 1):
+                candidate_edges.update(self.edge_buckets.get((bucket_col, bucket_row), ()))
+
+        near_edges = []
+        for ring_index, edge_index in candidate_edges:
+            ring = self.rings[ring_index]
+            start_x, start_y = ring[edge_index]
+            end_x, end_y = ring[(edge_index + 1) % len(ring)]
+            if (
+                max(start_x, end_x) >= box[0] and min(start_x, end_x) <= box[2]
+                and max(start_y, end_y) >= box[1] and min(start_y, end_y) <= box[3]
+            ):
+                near_edges.append((ring_index, edge_index))
+        return near_edges
+
+    def clip(self, subject: list[tuple[float, float]]) -> list[list[tuple[float, float]]]:
+        """Intersect a simple polygon with the outline.
+
+        Args:
+            subject: Polygon points, without repeating the first point;
+                repeated consecutive points are dropped before clipping
+
+        Returns:
+            Rings of the intersection, empty if the polygon lies outside the
+            shape. Rings nested at an odd depth (holes) are oriented against
+            the subject, so the result fills correctly with either fill rule
+            (with nonzero, also when pieces clipped from overlapping parts
+            of a merged outline overlap).
+
+        Note:
+            Vertices lying exactly on the outline are degenerate cases for
+            Greiner-Hormann; the polygon is then shifted by a negligible
+            amount and clipped again. If that keeps failing, the polygon is
+            returned unclipped.
+        """
+        subject = [point for point, previous in zip(subject, subject[-1:] + subject[:-1]) if point != previous]
+        if len(subject) < 3:
+            return []
+
+        xs = [point[0] for point in subject]
+        ys = [point[1] for point in subject]
+        shift = 1e-7 * max(max(xs) - min(xs), max(ys) - min(ys), 1e-9)
+        box = (min(xs), min(ys), max(xs) + 4 * shift, max(ys) + 4 * shift)
+        for attempt_number in range(4):
+            offset = shift * attempt_number
+            shifted = [(point_x + offset, point_y + 0.618 * offset) for point_x, point_y in subject]
+            part_rings = [self.clip_rings(shifted, box, part_index) for part_index in range(len(self.parts))]
+            if None not in part_rings:
+                break
+        else:
+            return [subject]
+
+        # Orient rings by nesting depth within each part: outer rings like the subject, holes reversed
+        subject_sign = 1 if signed_area(subject) >= 0 else -1
+        oriented_rings = []
+        for rings in part_rings:
+            if rings == [shifted]:
+                return [subject]  # entirely inside one part
+            for ring_index, ring in enumerate(rings):
+                depth = sum(
+                    1 for other_index, other in enumerate(rings)
+                    if other_index != ring_index and ring_contains(other, *ring[0])
+                )
+                wanted_sign = subject_sign if depth % 2 == 0 else -subject_sign
+                oriented_rings.append(ring if signed_area(ring) * wanted_sign >= 0 else ring[::-1])
+        return oriented_rings
+
+    def clip_rings(
+        self,
+        subject: list[tuple[float, float]],
+        box: tuple[float, float, float, float],
+        part_index: int
+    ) -> list[list[tuple[float, float]]] | None:
+        """Run Greiner-Hormann for one subject polygon and one part; None on a degenerate case."""
+        part = self.parts[part_index]
+
+        # Intersections between subject edges and nearby outline edges
+        subject_count = len(subject)
+        subject_hits = [[] for _ in range(subject_count)]
+        ring_hits = {}
+        near_rings = set()
+        for ring_index, edge_index in self.edges_near(box):
+            if self.ring_parts[ring_index] != part_index:
+                continue
+            near_rings.add(ring_index)
+            ring = self.rings[ring_index]
+            clip_start = ring[edge_index]
+            clip_end = ring[(edge_index + 1) % len(ring)]
+            for subject_index in range(subject_count):
+                intersection = segment_intersection(
+                    subject[subject_index], subject[(subject_index + 1) % subject_count], clip_start, clip_end
+                )
+                if intersection is None:
+                    continue
+                if intersection is False:
+                    return None
+                subject_alpha, clip_alpha, point_x, point_y = intersection
+                subject_node = ClipNode(point_x, point_y, subject_alpha, True)
+                clip_node = ClipNode(point_x, point_y, clip_alpha, True)
+                subject_node.neighbor = clip_node
+                clip_node.neighbor = subject_node
+                subject_hits[subject_index].append(subject_node)
+                ring_hits.setdefault(ring_index, {}).setdefault(edge_index, []).append(clip_node)
+
+        # Outline rings not crossing the subject are inside or outside it as a
+        # whole; rings inside it have all their edges near it
+        inner_rings = [
+            self.rings[ring_index] for ring_index in sorted(near_rings)
+            if ring_index not in ring_hits and ring_contains(subject, *self.rings[ring_index][0])
+        ]
+        if not ring_hits:
+            if part.polygon_contains(*subject[0]):
+                return [subject] + inner_rings
+            return inner_rings
+
+        # Linked lists with the intersections inserted in edge order
+        subject_start = link_clip_nodes(subject, subject_hits)
+        clip_starts = [
+            link_clip_nodes(self.rings[ring_index], [edge_hits.get(edge_index, []) for edge_index in range(len(self.rings[ring_index]))])
+            for ring_index, edge_hits in ring_hits.items()
+        ]
+
+        # Entry flags: the subject enters the shape (even-odd), an outline ring enters the subject
+        mark_entries(subject_start, part.polygon_contains(subject_start.x, subject_start.y))
+        for clip_start in clip_starts:
+            mark_entries(clip_start, ring_contains(subject, clip_start.x, clip_start.y))
+
+        # Walk from each unvisited intersection, switching polygons at every intersection
+        rings = []
+        node = subject_start
+        while True:
+            if node.intersect and not node.visited:
+                ring = [(node.x, node.y)]
+                current = node
+                while not current.visited:
+                    current.visited = True
+                    current.neighbor.visited = True
+                    forward = current.entry
+                    while True:
+                        current = current.next if forward else current.prev
+                        ring.append((current.x, current.y))
+                        if current.intersect:
+                            break
+                    current = current.neighbor
+                ring.pop()
+                if len(ring) >= 3:
+                    rings.append(ring)
+            node = node.next
+            if node is subject_start:
+                break
+
+        return rings + inner_rings
+
+
+def link_clip_nodes(
+    points: list[tuple[float, float]],
+    edge_hits: list[list[ClipNode]]
+) -> ClipNode:
+    """Build a circular linked list of polygon vertices and edge intersections.
+
+    Args:
+        points: Polygon points
+        edge_hits: Per edge (from points[i] to points[i + 1]), its
+            intersection nodes in any order
+
+    Returns:
+        Node of the first polygon point
+    """
+    nodes = []
+    for point, hits in zip(points, edge_hits):
+        nodes.append(ClipNode(*point))
+        nodes.extend(sorted(hits, key=lambda hit: hit.alpha))
+    for node, next_node in zip(nodes, nodes[1:] + nodes[:1]):
+        node.next = next_node
+        next_node.prev = node
+    return nodes[0]
+
+
+def mark_entries(start: ClipNode, start_inside: bool) -> None:
+    """Flag each intersection of a linked polygon as entry or exit.
+
+    Args:
+        start: Non-intersection node to start from
+        start_inside: Whether that node lies inside the other polygon
+    """
+    inside = start_inside
+    node = start
+    while True:
+        if node.intersect:
+            node.entry = not inside
+            inside = not inside
+        node = node.next
+        if node is start:
+            break
+
+
+def segment_intersection(
+    p0: tuple[float, float],
+    p1: tuple[float, float],
+    q0: tuple[float, float],
+    q1: tuple[float, float]
+):
+    """Intersect segments p0-p1 and q0-q1.
+
+    Returns:
+        (alpha_p, alpha_q, x, y) for a proper crossing, None if the segments
+        do not meet, or False if they touch at an end point or overlap
+    """
+    p_dx, p_dy = p1[0] - p0[0], p1[1] - p0[1]
+    q_dx, q_dy = q1[0] - q0[0], q1[1] - q0[1]
+    offset_x, offset_y = q0[0] - p0[0], q0[1] - p0[1]
+    denominator = p_dx * q_dy - p_dy * q_dx
+    if denominator == 0:
+        # Parallel: only collinear overlapping segments are a problem
+        if offset_x * p_dy - offset_y * p_dx != 0:
+            return None
+        p_length_squared = p_dx * p_dx + p_dy * p_dy
+        if p_length_squared == 0:
+            return None  # zero-length edge: its neighbors meet q at their end points instead
+        start = (offset_x * p_dx + offset_y * p_dy) / p_length_squared
+        end = ((q1[0] - p0[0]) * p_dx + (q1[1] - p0[1]) * p_dy) / p_length_squared
+        if max(start, end) < 0 or min(start, end) > 1:
+            return None
+        return False
+
+    alpha_p = (offset_x * q_dy - offset_y * q_dx) / denominator
+    alpha_q = (offset_x * p_dy - offset_y * p_dx) / denominator
+    epsilon = 1e-9
+    if alpha_p < -epsilon or alpha_p > 1 + epsilon or alpha_q < -epsilon or alpha_q > 1 + epsilon:
+        return None
+    if alpha_p < epsilon or alpha_p > 1 - epsilon or alpha_q < epsilon or alpha_q > 1 - epsilon:
+        return False
+    return alpha_p, alpha_q, p0[0] + alpha_p * p_dx, p0[1] + alpha_p * p_dy
+
+
+def ring_contains(ring: list[tuple[float, float]], test_x: float, test_y: float) -> bool:
+    """Test if a point is inside a single polygon ring (even-odd rule)."""
+    inside = False
+    previous_x, previous_y = ring[-1]
+    for point_x, point_y in ring:
+        if (point_y > test_y) != (previous_y > test_y):
+            crossing_x = point_x + (test_y - point_y) * (previous_x - point_x) / (previous_y - point_y)
+            if crossing_x > test_x:
+                inside = not inside
+        previous_x, previous_y = point_x, point_y
+    return inside
+
+
+def signed_area(ring: list[tuple[float, float]]) -> float:
+    """Return the signed area of a polygon ring (shoelace formula)."""
+    previous_x, previous_y = ring[-1]
+    area = 0.0
+    for point_x, point_y in ring:
+        area += previous_x * point_y - point_x * previous_y
+        previous_x, previous_y = point_x, point_y
+    return area / 2
+
+
+class DiskCache:
+    """Size-bounded directory of JSON files addressed by content hash.
+
+    Entries are evicted least recently used first once the directory grows
+    beyond max_bytes; a hit refreshes the entry's modification time. Read
+    and write errors are treated as cache misses so a missing or read-only
+    cache directory never breaks a run.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str):
+        """Return the cached value for key, or None on a miss."""
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, encoding="utf-8") as cache_file:
+                value = json.load(cache_file)
+            os.utime(entry_path)  # Mark as recently used
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, value) -> None:
+        """Store a JSON-serializable value under key, then evict old entries."""
+        entry_path = self.entry_path(key)
+        temporary_path = f"{entry_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporary_path, "w", encoding="utf-8") as cache_file:
+                json.dump(value, cache_file, separators=(",", ":"))
+            os.replace(temporary_path, entry_path)
+            self.evict()
+        except OSError:
+            pass
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total_bytes = 0
+        with os.scandir(self.directory) as directory_entries:
+            for directory_entry in directory_entries:
+                if not directory_entry.name.endswith(".json"):
+                    continue
+                entry_stat = directory_entry.stat()
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, directory_entry.path))
+                total_bytes += entry_stat.st_size
+
+        entries.sort()
+        for modification_time, entry_size, entry_path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(entry_path)
+                total_bytes -= entry_size
+            except OSError:
+                pass
+
+
+def segment_distance_squared(
+    point: tuple[float, float],
+    segment_start: tuple[float, float],
+    segment_end: tuple[float, float]
+) -> float:
+    """Return the squared distance from a point to a line segment."""
+    segment_dx = segment_end[0] - segment_start[0]
+    segment_dy = segment_end[1] - segment_start[1]
+    point_dx = point[0] - segment_start[0]
+    point_dy = point[1] - segment_start[1]
+    segment_length_squared = segment_dx * segment_dx + segment_dy * segment_dy
+    if segment_length_squared > 0:
+        # Project onto the segment, clamped to its ends
+        t = max(0.0, min(1.0, (point_dx * segment_dx + point_dy * segment_dy) / segment_length_squared))
+        point_dx -= t * segment_dx
+        point_dy -= t * segment_dy
+    return point_dx * point_dx + point_dy * point_dy
+
+
+def default_cache_directory() -> str:
+    """Return the cache directory ($TIMEWORN_CACHE_DIR or the user cache directory)."""
+    if os.environ.get("TIMEWORN_CACHE_DIR"):
+        return os.environ["TIMEWORN_CACHE_DIR"]
+    user_cache_directory = (
+        os.environ.get("XDG_CACHE_HOME")
+        or os.environ.get("LOCALAPPDATA")
+        or os.path.join(os.path.expanduser("~"), ".cache")
+    )
+    return os.path.join(user_cache_directory, "timeworn")
+
+
+def cache_key(*parts) -> str:
+    """Return a content hash of JSON-serializable parts."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+class RunStats:
+    """Stage timers, counters and histograms of the instrumentation mode.
+
+    A disabled instance ignores every call, so the pipeline records
+    unconditionally. Timers are summed over shapes (and thus over worker
+    processes); histograms map a value, such as the retry round in which a
+    point was accepted, to the number of times it occurred.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.timers = {}
+        self.counters = {}
+        self.histograms = {}
+
+    @contextlib.contextmanager
+    def timer(self, stage: str):
+        """Add the duration of the with-block to a stage timer."""
+        if not self.enabled:
+            yield
+            return
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[stage] = self.timers.get(stage, 0.0) + time.perf_counter() - start_time
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add to a counter."""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, name: str, value: int, amount: int = 1) -> None:
+        """Add occurrences of a value to a histogram."""
+        if self.enabled and amount:
+            histogram = self.histograms.setdefault(name, {})
+            histogram[value] = histogram.get(value, 0) + amount
+
+    def merge(self, data: dict) -> None:
+        """Add the statistics returned by another instance's to_json()."""
+        if not self.enabled:
+            return
+        for stage, seconds in data["timers"].items():
+            self.timers[stage] = self.timers.get(stage, 0.0) + seconds
+        for name, amount in data["counters"].items():
+            self.count(name, amount)
+        for name, histogram in data["histograms"].items():
+            for value, amount in histogram.items():
+                self.record(name, int(value), amount)
+
+    def to_json(self) -> dict:
+        """Return the statistics as a JSON-serializable dict."""
+        return {
+            "timers": dict(self.timers),
+            "counters": dict(self.counters),
+            "histograms": {
+                name: {str(value): amount for value, amount in sorted(histogram.items())}
+                for name, histogram in self.histograms.items()
+            }
+        }
+
+    def report_lines(self) -> list[str]:
+        """Return a human-readable summary of the statistics.
+
+        Note:
+            Every "<name>_candidates" counter with a matching
+            "<name>_accepted" counter also gets an acceptance rate.
+        """
+        lines = ["Timeworn statistics:"]
+        for stage, seconds in sorted(self.timers.items(), key=lambda item: -item[1]):
+            lines.append(f"  {stage + ' time':<28} {seconds:10.3f} s")
+        for name, amount in sorted(self.counters.items()):
+            lines.append(f"  {name:<28} {amount:10d}")
+        for name, candidate_count in sorted(self.counters.items()):
+            if name.endswith("_candidates") and candidate_count:
+                accepted_count = self.counters.get(name[:-len("_candidates")] + "_accepted", 0)
+                lines.append(
+                    f"  {name[:-len('_candidates')] + ' acceptance':<28} "
+                    f"{100.0 * accepted_count / candidate_count:9.1f} %"
+                )
+        for name, histogram in sorted(self.histograms.items()):
+            lines.append(f"  {name}: " + ", ".join(
+                f"{value}: {amount}" for value, amount in sorted(histogram.items())
+            ))
+        return lines
+
+
+def instrumentation_requested(options: argparse.Namespace) -> bool:
+    """Return whether statistics are collected ($TIMEWORN_STATS, $TIMEWORN_STATS_FILE or the option)."""
+    return bool(
+        options.instrument
+        or os.environ.get("TIMEWORN_STATS")
+        or os.environ.get("TIMEWORN_STATS_FILE")
+    )
+
+
+def spot_bucket_key(output_mode: str, spot: tuple):
+    """Return the compound path a spot is merged into in a merged output mode."""
+    if output_mode == "by_shape":
+        return spot[1]
+    if output_mode == "by_cluster":
+        return spot[2]
+    return None
+
+
+class DocumentSpotSink:
+    """Writes spots into a spots group of the document.
+
+    Spots are added a chunk at a time; with a merged output mode their
+    path data is collected and written as one compound path per output
+    bucket on close().
+    """
+
+    def __init__(self, spots_group, output_mode: str):
+        self.spots_group = spots_group
+        self.output_mode = output_mode
+        self.merged_path_data = {}
+
+    def add(self, spots: list[tuple[str, str, int | None, int]]) -> None:
+        """Write a chunk of spots as returned by Timeworn.generate_spots()."""
+        if self.output_mode == "separate":
+            for path_data, spot_kind, cluster_index, spot_index in spots:
+                # Create SVG path element for this spot
+                # Path data is written as is, without a parse round-trip through inkex.Path
+                spot_path_element = self.spots_group.add(inkex.PathElement())
+                spot_path_element.set("d", path_data)
+                spot_path_element.set(SPOT_INDEX_ATTRIBUTE, str(spot_index))
+            return
+
+        # Collect path data per output bucket
+        for spot in spots:
+            self.merged_path_data.setdefault(spot_bucket_key(self.output_mode, spot), []).append(spot[0])
+
+    def close(self) -> None:
+        """Write one compound path per output bucket."""
+        for path_data_parts in self.merged_path_data.values():
+            merged_path_element = self.spots_group.add(inkex.PathElement())
+            merged_path_element.set("d", " ".join(path_data_parts))
+        self.merged_path_data = {}
+
+
+class StreamSpotSink:
+    """Writes spots as SVG markup straight to a binary output stream.
+
+    Nothing is kept between chunks: with a merged output mode, each chunk
+    becomes one compound path per output bucket.
+    """
+
+    def __init__(self, write, output_mode: str, path_tag: str = "path"):
+        """Set up the sink.
+
+        Args:
+            write: Function writing bytes to the output
+            output_mode: Output mode option
+            path_tag: Qualified tag of SVG paths in the output document
+        """
+        self.write = write
+        self.output_mode = output_mode
+        self.path_tag = path_tag
+
+    def add(self, spots: list[tuple[str, str, int | None, int]]) -> None:
+        """Write a chunk of spots as returned by Timeworn.generate_spots()."""
+        # Path data only holds commands and numbers, so it needs no escaping
+        if self.output_mode == "separate":
+            self.write("".join(
+                f'<{self.path_tag} d="{path_data}" {SPOT_INDEX_ATTRIBUTE}="{spot_index}"/>'
+                for path_data, spot_kind, cluster_index, spot_index in spots
+            ).encode())
+            return
+
+        merged_path_data = {}
+        for spot in spots:
+            merged_path_data.setdefault(spot_bucket_key(self.output_mode, spot), []).append(spot[0])
+        self.write("".join(
+            f'<{self.path_tag} d="{" ".join(path_data_parts)}"/>'
+            for path_data_parts in merged_path_data.values()
+        ).encode())
+
+    def close(self) -> None:
+        """Nothing is buffered; present for symmetry with DocumentSpotSink."""
+
+
+class CompactPathWriter:
+    """Writes subpaths as compact path data with a fixed number of decimals.
+
+    Coordinates are first rounded to integers on the output precision, so
+    every point after the start of a subpath can be written relative to the
+    end of the previous segment without rounding errors adding up. The
+    segment command is written once per subpath (later segments repeat it
+    implicitly), numbers lose trailing zeros and the leading zero of
+    fractions, and no separator precedes a minus sign:
+    "M 10.500,2.000 L 11.000,1.250 Z" becomes "M10.5,2l.5-.75z".
+    """
+
+    def __init__(self, precision: int):
+        self.precision = precision
+        self.scale = 10 ** precision
+        self.number_texts = {}
+        self.path_formats = {}
+
+    def number_text(self, scaled_value: int) -> str:
+        """Return the shortest text of a coordinate given in output units (memoized)."""
+        text = self.number_texts.get(scaled_value)
+        if text is None:
+            integer_part, fraction = divmod(abs(scaled_value), self.scale)
+            text = str(integer_part) if integer_part or not fraction else ""
+            if fraction:
+                text += ("." + str(fraction).rjust(self.precision, "0")).rstrip("0")
+            if scaled_value < 0:
+                text = "-" + text
+            self.number_texts[scaled_value] = text
+        return text
+
+    def subpaths(self, rows: list[list[float]], group_size: int, command: str) -> list[str]:
+        """Write closed subpaths that all have the same number of coordinates.
+
+        Args:
+            rows: Flat coordinates per subpath: start point, then groups of
+                group_size values per segment, each ending on a point
+            group_size: 6 for cubic curves, 2 for lines
+            command: Relative command of the segments, "c" or "l"
+
+        Returns:
+            Path data per subpath, in the same order as rows
+        """
+        row_length = len(rows[0])
+
+        # Values after the start point minus the end of the previous segment
+        base_columns = [
+            (column - 2) // group_size * group_size + column % 2 for column in range(2, row_length)
+        ]
+        if np is not None:
+            scaled_rows = np.rint(np.asarray(rows, dtype=float) * self.scale).astype(np.int64)
+            scaled_rows[:, 2:] -= scaled_rows[:, base_columns]
+            scaled_rows = scaled_rows.tolist()
+        else:
+            scaled_rows = []
+            for row in rows:
+                scaled_row = [round(value * self.scale) for value in row]
+                scaled_rows.append(scaled_row[:2] + [
+                    scaled_row[column] - scaled_row[base_column]
+                    for column, base_column in zip(range(2, row_length), base_columns)
+                ])
+
+        path_format = self.path_formats.get((row_length, command))
+        if path_format is None:
+            path_format = f"M%s,%s{command}" + " ".join(["%s,%s"] * (row_length // 2 - 1)) + "z"
+            self.path_formats[(row_length, command)] = path_format
+
+        number_texts = self.number_texts
+        number_text = self.number_text
+        return [
+            (path_format % tuple([
+                number_texts[value] if value in number_texts else number_text(value) for value in scaled_row
+            ])).replace(",-", "-").replace(" -", "-")
+            for scaled_row in scaled_rows
+        ]
+
+
+class ShapeJob:
+    """Picklable description of one shape to weather.
+
+    Attributes:
+        flattened_path: Flattened outline of the shape
+        bbox: Bounding box of the shape
+        seed: Seed of the shape's random sequence
+        coverage_grid: Coverage grid loaded from the geometry cache, or None
+        geometry_key: Geometry cache key, or None when the grid must not be cached
+        first_spot: Index of the first spot to generate (see
+            Timeworn.reusable_spot_count)
+    """
+
+    def __init__(
+        self,
+        flattened_path: FlattenedPath,
+        bbox,
+        seed: int,
+        coverage_grid: CoverageGrid | CoverageQuadtree | None = None,
+        geometry_key: str | None = None,
+        first_spot: int = 0
+    ):
+        self.flattened_path = flattened_path
+        self.bbox = bbox
+        self.seed = seed
+        self.coverage_grid = coverage_grid
+        self.geometry_key = geometry_key
+        self.first_spot = first_spot
+
+
+class Timeworn(inkex.EffectExtension):
+
+    def __init__(self):
+        super().__init__()
+        self.stats = RunStats(enabled=False)
+        self.streamed_jobs = []
+
+    def add_arguments(self, pars):
+        pars.add_argument("--tabs", default="objects")
+        pars.add_argument("--density", type=int, default=200)
+        pars.add_argument("--size_min", type=float, default=0.5)
+        pars.add_argument("--size_max", type=float, default=3.0)
+        pars.add_argument("--irregularity", type=int, default=50)
+        pars.add_argument("--shape_type", default="organic")
+        pars.add_argument("--coverage_mode", default="exact")
+        pars.add_argument("--adaptive_grid", type=inkex.Boolean, default=True)
+        pars.add_argument("--flatten_tolerance", type=float, default=0.05)
+        pars.add_argument("--grid_cell_size", type=float, default=GRID_CELL_SIZE_MM)
+        pars.add_argument("--distribution", default="random")
+        pars.add_argument("--min_spacing", type=float, default=0.5)
+        pars.add_argument("--spacing_by_size", type=inkex.Boolean, default=False)
+        pars.add_argument("--clustering", type=int, default=30)
+        pars.add_argument("--num_clusters", type=int, default=5)
+        pars.add_argument("--density_map", default="none")
+        pars.add_argument("--density_image", default="")
+        pars.add_argument("--density_angle", type=float, default=90.0)
+        pars.add_argument("--density_falloff", type=float, default=10.0)
+        pars.add_argument("--density_background", type=int, default=0)
+        pars.add_argument("--density_invert", type=inkex.Boolean, default=False)
+        pars.add_argument("--elongation", type=float, default=1.5)
+        pars.add_argument("--elongation_variation", type=int, default=30)
+        pars.add_argument("--elongation_angle", type=float, default=45.0)
+        pars.add_argument("--angle_variation", type=int, default=30)
+        pars.add_argument("--clip_to_shape", type=inkex.Boolean, default=False)
+        pars.add_argument("--output_mode", default="separate")
+        pars.add_argument("--path_precision", type=int, default=SPOT_COORDINATE_PRECISION)
+        pars.add_argument("--compact_paths", type=inkex.Boolean, default=True)
+        pars.add_argument("--workers", type=int, default=0)
+        pars.add_argument("--seed", type=int, default=0)
+        pars.add_argument("--use_cache", type=inkex.Boolean, default=True)
+        pars.add_argument("--instrument", type=inkex.Boolean, default=False)
+        pars.add_argument("--stream_output", type=inkex.Boolean, default=False)
+
+    def flatten_bezier(
+        self,
+        p0: tuple[float, float],
+        p1: tuple[float, float],
+        p2: tuple[float, float],
+        p3: tuple[float, float],
+        segments: int = BEZIER_FLATTEN_SEGMENTS,
+        tolerance: float | None = None
+    ) -> list[tuple[float, float]]:
+        """Flatten a cubic Bézier curve into line segments.
+
+        Args:
+            p0: Start point (x, y)
+            p1: First control point (x, y)
+            p2: Second control point (x, y)
+            p3: End point (x, y)
+            segments: Number of segments to subdivide the curve into when no
+                tolerance is given
+            tolerance: Maximum distance between the curve and its flattened
+                polyline, in user units; enables adaptive subdivision
+
+        Returns:
+            List of points forming the flattened curve
+
+        Note:
+            Uses standard cubic Bézier formula for interpolation. With a
+            tolerance, the curve is split recursively until it is flat, so
+            straight segments produce a single line and large tight curves
+            as many as needed.
+        """
+        if tolerance is not None:
+            points = [p0]
+            self.subdivide_bezier(p0, p1, p2, p3, tolerance * tolerance, points, 0)
+            return points
+
+        points = []
+        for segment_index in range(segments + 1):
+            t = segment_index / segments
+            # Cubic Bézier formula
+            t2 = t * t
+            t3 = t2 * t
+            mt = 1 - t
+            mt2 = mt * mt
+            mt3 = mt2 * mt
+
+            point_x = mt3 * p0[0] + 3 * mt2 * t * p1[0] + 3 * mt * t2 * p2[0] + t3 * p3[0]
+            point_y = mt3 * p0[1] + 3 * mt2 * t * p1[1] + 3 * mt * t2 * p2[1] + t3 * p3[1]
+            points.append((point_x, point_y))
+        return points
+
+    def subdivide_bezier(
+        self,
+        p0: tuple[float, float],
+        p1: tuple[float, float],
+        p2: tuple[float, float],
+        p3: tuple[float, float],
+        tolerance_squared: float,
+        points: list[tuple[float, float]],
+        depth: int
+    ) -> None:
+        """Append the flattened points of a cubic Bézier curve after p0.
+
+        Args:
+            p0: Start point (x, y), already in points
+            p1: First control point (x, y)
+            p2: Second control point (x, y)
+            p3: End point (x, y)
+            tolerance_squared: Squared flatness tolerance
+            points: List receiving the points
+            depth: Current recursion depth
+
+        Note:
+            The curve lies inside the convex hull of its control points, so
+            once both control points are within tolerance of the chord the
+            chord is within tolerance of the curve. Otherwise the curve is
+            split in half (de Casteljau) and both halves are flattened.
+        """
+        is_flat = (
+            depth >= BEZIER_MAX_SUBDIVISION_DEPTH
+            or (
+                segment_distance_squared(p1, p0, p3) <= tolerance_squared
+                and segment_distance_squared(p2, p0, p3) <= tolerance_squared
+            )
+        )
+        if is_flat:
+            points.append(p3)
+            return
+
+        # de Casteljau split at t=0.5
+        p01 = ((p0[0] + p1[0]) / 2, (p0[1] + p1[1]) / 2)
+        p12 = ((p1[0] + p2[0]) / 2, (p1[1] + p2[1]) / 2)
+        p23 = ((p2[0] + p3[0]) / 2, (p2[1] + p3[1]) / 2)
+        p012 = ((p01[0] + p12[0]) / 2, (p01[1] + p12[1]) / 2)
+        p123 = ((p12[0] + p23[0]) / 2, (p12[1] + p23[1]) / 2)
+        midpoint = ((p012[0] + p123[0]) / 2, (p012[1] + p123[1]) / 2)
+
+        self.subdivide_bezier(p0, p01, p012, midpoint, tolerance_squared, points, depth + 1)
+        self.subdivide_bezier(midpoint, p123, p23, p3, tolerance_squared, points, depth + 1)
+
+    def flatten_path(
+        self,
+        path_element,
+        tolerance: float | None = None,
+        transform: inkex.Transform | None = None
+    ) -> FlattenedPath:
+        """Flatten a path element into an indexed polygon outline.
+
+        Args:
+            path_element: SVG path element to flatten
+            tolerance: Flattening tolerance in user units, or None for
+                BEZIER_FLATTEN_SEGMENTS segments per curve
+            transform: Transform applied to the path before flattening,
+                usually its composed transform to document coordinates
+
+        Returns:
+            FlattenedPath holding the line segments and the ring of every subpath
+
+        Note:
+            Every subpath is closed by a straight line from its last point to
+            its first. The result is meant to be built once per run and shared by all
+            containment tests.
+        """
+        # Get path as superpath for predictable format; transforms are affine,
+        # so transforming the control points transforms the curves exactly
+        path = path_element.path
+        if transform is not None:
+            path = path.transform(transform)
+        path = path.to_superpath()
+
+        # Flatten path to line segments
+        line_segments = []
+        rings = []
+        for subpath in path:
+            ring = []
+            for point_index in range(len(subpath)):
+                # Each segment in superpath is ((x,y), (cp1_x, cp1_y), (cp2_x, cp2_y))
+                current_point = subpath[point_index]
+                next_point_index = (point_index + 1) % len(subpath)
+
+                # Close path - connect last to first
+                if next_point_index == 0 and point_index == len(subpath) - 1:
+                    next_point = subpath[0]
+                else:
+                    next_point = subpath[next_point_index]
+
+                # Extract Bézier control points
+                bezier_p0 = (current_point[1][0], current_point[1][1])  # current point
+                bezier_p1 = (current_point[2][0], current_point[2][1])  # control point 1
+                bezier_p2 = (next_point[0][0], next_point[0][1])  # control point 2
+                bezier_p3 = (next_point[1][0], next_point[1][1])  # next point
+
+                # The closing segment is a straight line (none if the subpath
+                # already ends on its first point); the handles of the first
+                # point belong to its outgoing curve and would add a spur
+                if next_point_index == 0:
+                    if bezier_p0 == bezier_p3:
+                        continue
+                    bezier_p1, bezier_p2 = bezier_p0, bezier_p3
+
+                # Flatten Bézier curve to line segments
+                flattened_points = self.flatten_bezier(
+                    bezier_p0, bezier_p1, bezier_p2, bezier_p3, tolerance=tolerance
+                )
+                for segment_index in range(len(flattened_points) - 1):
+                    line_segments.append((
+                        flattened_points[segment_index],
+                        flattened_points[segment_index + 1]
+                    ))
+                ring.extend(flattened_points[:-1])
+            rings.append(ring)
+
+        return FlattenedPath(line_segments, rings)
+
+    def points_in_path(
+        self,
+        test_xs,
+        test_ys,
+        flattened_path: FlattenedPath
+    ):
+        """Test a batch of points against the path in one call.
+
+        Args:
+            test_xs: Sequence of X coordinates
+            test_ys: Sequence of Y coordinates
+            flattened_path: Flattened outline returned by flatten_path()
+
+        Returns:
+            Boolean mask marking the points inside the path
+
+        Note:
+            Vectorized with NumPy when available, pure Python otherwise.
+        """
+        self.stats.count("containment_tests", len(test_xs))
+        return flattened_path.contains_many(test_xs, test_ys)
+
+    def create_coverage_grid(
+        self,
+        bbox,
+        flattened_path: FlattenedPath,
+        cell_size: float,
+        rng: random.Random,
+        coverage_mode: str = "exact",
+        adaptive: bool = False
+    ) -> CoverageGrid | CoverageQuadtree:
+        """Create coverage grid with fixed cell size.
+
+        Args:
+            bbox: Bounding box of the shape
+            flattened_path: Flattened outline to test against
+            cell_size: Cell size in user units (--grid_cell_size converted)
+            rng: Random generator used by sampled coverage
+            coverage_mode: "exact" for scanline rasterization, "sampled" for
+                random point sampling
+            adaptive: With exact coverage, build a CoverageQuadtree instead
+                (see create_coverage_quadtree())
+
+        Returns:
+            CoverageGrid (or CoverageQuadtree) with cell states (0=empty,
+            1=partial, 2=full) and coverage fractions
+        """
+        if adaptive and coverage_mode == "exact":
+            with self.stats.timer("coverage_grid"):
+                return self.create_coverage_quadtree(bbox, flattened_path, cell_size)
+
+        bbox_width, bbox_height = bbox.width, bbox.height
+
+        # Calculate grid dimensions
+        grid_cols = max(1, int(bbox_width / cell_size))
+        grid_rows = max(1, int(bbox_height / cell_size))
+
+        # Actual cell dimensions
+        coverage_grid = CoverageGrid(
+            bbox.left, bbox.top, grid_cols, grid_rows,
+            bbox_width / grid_cols, bbox_height / grid_rows
+        )
+
+        with self.stats.timer("coverage_grid"):
+            if coverage_mode == "sampled":
+                self.sample_coverage(coverage_grid, flattened_path, rng)
+            else:
+                self.rasterize_coverage(coverage_grid, flattened_path)
+        return coverage_grid
+
+    def create_coverage_quadtree(
+        self,
+        bbox,
+        flattened_path: FlattenedPath,
+        cell_size: float,
+        scanlines_per_cell: int = GRID_SCANLINES_PER_CELL
+    ) -> CoverageQuadtree:
+        """Create an adaptive coverage quadtree over the shape's bounding box.
+
+        Args:
+            bbox: Bounding box of the shape
+            flattened_path: Flattened outline to classify
+            cell_size: Cell size of the fixed grid in user units; leaves
+                crossed by the outline are QUADTREE_REFINE_LEVELS times
+                halved smaller
+            scanlines_per_cell: Number of scanlines per partial leaf used to
+                measure coverage fractions
+
+        Returns:
+            CoverageQuadtree whose partial leaves all have the minimum size
+
+        Note:
+            The cells crossed by the outline are found once at the minimum
+            size (see cells_touched_by_outline()); a node is split while any
+            cell below it is crossed. Nodes the outline does not cross are
+            entirely inside or outside the shape, decided by one batched
+            point test of their centers. Partial leaves are measured with
+            the scanline fill of rasterize_coverage(), one row of leaves at
+            a time.
+        """
+        min_cell_size = cell_size / 2 ** QUADTREE_REFINE_LEVELS
+        max_depth = max(0, math.ceil(math.log2(max(bbox.width, bbox.height, min_cell_size) / min_cell_size)))
+        coverage_tree = CoverageQuadtree(bbox.left, bbox.top, min_cell_size * 2 ** max_depth, cell_size)
+
+        # Cells crossed by the outline at the minimum size, then at every
+        # coarser level (a node is crossed if any of its quarters is). Edges
+        # along the border of two small cells run through the inside of the
+        # larger nodes above them, so they count for both cells.
+        finest_count = 2 ** max_depth
+        touched_levels = [None] * (max_depth + 1)
+        touched_levels[max_depth] = self.cells_touched_by_outline(
+            flattened_path, coverage_tree.x_min, coverage_tree.y_min,
+            min_cell_size, min_cell_size, finest_count, finest_count,
+            include_borders=True
+        )
+        for depth in range(max_depth - 1, -1, -1):
+            touched_levels[depth] = {(row_index >> 1, col_index >> 1) for row_index, col_index in touched_levels[depth + 1]}
+
+        # Split crossed nodes down to the minimum size
+        untouched_nodes = []
+        partial_rows = {}
+        pending_nodes = [(0, 0, 0, 0)]
+        while pending_nodes:
+            node, depth, row_index, col_index = pending_nodes.pop()
+            if (row_index, col_index) not in touched_levels[depth]:
+                untouched_nodes.append(node)
+            elif depth == max_depth:
+                coverage_tree.states[node] = 1  # partial
+                partial_rows.setdefault(row_index, []).append(node)
+            else:
+                first_child = coverage_tree.split(node)
+                for quadrant in range(4):
+                    pending_nodes.append((
+                        first_child + quadrant, depth + 1,
+                        2 * row_index + quadrant // 2, 2 * col_index + quadrant % 2
+                    ))
+
+        # Untouched nodes are entirely inside or outside
+        inside_mask = self.points_in_path(
+            [coverage_tree.node_boxes[node][0] + coverage_tree.node_boxes[node][2] / 2 for node in untouched_nodes],
+            [coverage_tree.node_boxes[node][1] + coverage_tree.node_boxes[node][2] / 2 for node in untouched_nodes],
+            flattened_path
+        )
+        for node, inside in zip(untouched_nodes, inside_mask):
+            if inside:
+                coverage_tree.states[node] = 2  # full
+                coverage_tree.coverage[node] = 1.0
+
+        # Measure the partial leaves of each row with shared scanlines
+        for row_index, row_nodes in partial_rows.items():
+            row_nodes.sort(key=lambda node: coverage_tree.node_boxes[node][0])
+            node_xs = [coverage_tree.node_boxes[node][0] for node in row_nodes]
+            covered_lengths = [0.0] * len(row_nodes)
+            for scanline_index in range(scanlines_per_cell):
+                scan_y = coverage_tree.y_min + (row_index + (scanline_index + 0.5) / scanlines_per_cell) * min_cell_size
+                crossings = flattened_path.scanline_crossings(scan_y)
+                for span_index in range(0, len(crossings) - 1, 2):
+                    span_start, span_end = crossings[span_index], crossings[span_index + 1]
+                    first_position = max(0, bisect.bisect_right(node_xs, span_start) - 1)
+                    for position in range(first_position, bisect.bisect_left(node_xs, span_end)):
+                        node_x = node_xs[position]
+                        covered_lengths[position] += max(
+                            0.0, min(span_end, node_x + min_cell_size) - max(span_start, node_x)
+                        )
+            for node, covered_length in zip(row_nodes, covered_lengths):
+                coverage_tree.coverage[node] = max(0.0, min(1.0, covered_length / (min_cell_size * scanlines_per_cell)))
+
+        return coverage_tree
+
+    def sample_coverage(
+        self,
+        coverage_grid: CoverageGrid,
+        flattened_path: FlattenedPath,
+        rng: random.Random
+    ) -> None:
+        """Classify grid cells by testing random sample points.
+
+        Args:
+            coverage_grid: Grid to fill in
+            flattened_path: Flattened outline to test against
+            rng: Random generator for sample positions
+
+        Note:
+            Samples GRID_SAMPLES_PER_CELL points per cell to classify coverage.
+            Cells with >=90% coverage are marked as full.
+        """
+        grid_cols, grid_rows = coverage_grid.cols, coverage_grid.rows
+
+        # Draw sample points for every cell, then test them in a single batch
+        samples_per_cell = GRID_SAMPLES_PER_CELL
+        sample_xs = []
+        sample_ys = []
+        for row_index in range(grid_rows):
+            for col_index in range(grid_cols):
+                for sample_index in range(samples_per_cell):
+                    sample_x, sample_y = coverage_grid.random_point_in_cell((row_index, col_index), rng)
+                    sample_xs.append(sample_x)
+                    sample_ys.append(sample_y)
+
+        inside_mask = self.points_in_path(sample_xs, sample_ys, flattened_path)
+
+        for row_index in range(grid_rows):
+            for col_index in range(grid_cols):
+                first_sample = (row_index * grid_cols + col_index) * samples_per_cell
+                inside_count = int(sum(inside_mask[first_sample:first_sample + samples_per_cell]))
+
+                # Classify cell
+                coverage = inside_count / samples_per_cell
+                coverage_grid.coverage[row_index][col_index] = coverage
+                if coverage == 0:
+                    coverage_grid.states[row_index][col_index] = 0  # empty
+                elif coverage >= FULL_CELL_COVERAGE_THRESHOLD:
+                    coverage_grid.states[row_index][col_index] = 2  # full
+                else:
+                    coverage_grid.states[row_index][col_index] = 1  # partial
+
+    def rasterize_coverage(
+        self,
+        coverage_grid: CoverageGrid,
+        flattened_path: FlattenedPath,
+        scanlines_per_cell: int = GRID_SCANLINES_PER_CELL
+    ) -> None:
+        """Classify grid cells exactly with a scanline fill under the outline's fill rule.
+
+        Args:
+            coverage_grid: Grid to fill in
+            flattened_path: Flattened outline to rasterize
+            scanlines_per_cell: Number of scanlines per cell row used to
+                measure coverage fractions
+
+        Note:
+            Cells crossed by an outline edge are partial. Every other cell
+            lies entirely inside or outside the shape, so it is full or empty
+            depending on its measured coverage. Inside spans come from
+            FlattenedPath.scanline_crossings(), so even-odd outlines and
+            nonzero ones (merged groups) both fill correctly. The cost is
+            proportional to edges + cells instead of cells x samples x edges.
+        """
+        grid_cols, grid_rows = coverage_grid.cols, coverage_grid.rows
+        x_min, y_min = coverage_grid.x_min, coverage_grid.y_min
+        cell_width, cell_height = coverage_grid.cell_width, coverage_grid.cell_height
+        x_max = x_min + grid_cols * cell_width
+        coverage_grid.exact_coverage = True
+
+        # Accumulate inside span lengths per cell row with a difference array:
+        # cells fully covered by a span get +cell_width through the running sum,
+        # partially covered end cells get their exact share directly
+        for row_index in range(grid_rows):
+            full_cell_deltas = [0.0] * (grid_cols + 1)
+            partial_lengths = [0.0] * grid_cols
+            for scanline_index in range(scanlines_per_cell):
+                scan_y = y_min + (row_index + (scanline_index + 0.5) / scanlines_per_cell) * cell_height
+                crossings = flattened_path.scanline_crossings(scan_y)
+                for span_index in range(0, len(crossings) - 1, 2):
+                    span_start = max(x_min, crossings[span_index])
+                    span_end = min(x_max, crossings[span_index + 1])
+                    if span_end <= span_start:
+                        continue
+
+                    first_col = min(grid_cols - 1, int((span_start - x_min) / cell_width))
+                    last_col = min(grid_cols - 1, int((span_end - x_min) / cell_width))
+                    if first_col == last_col:
+                        partial_lengths[first_col] += span_end - span_start
+                        continue
+
+                    partial_lengths[first_col] += x_min + (first_col + 1) * cell_width - span_start
+                    partial_lengths[last_col] += span_end - (x_min + last_col * cell_width)
+                    full_cell_deltas[first_col + 1] += cell_width
+                    full_cell_deltas[last_col] -= cell_width
+
+            running_length = 0.0
+            for col_index in range(grid_cols):
+                running_length += full_cell_deltas[col_index]
+                covered_length = running_length + partial_lengths[col_index]
+                coverage = covered_length / (cell_width * scanlines_per_cell)
+                coverage_grid.coverage[row_index][col_index] = max(0.0, min(1.0, coverage))
+
+        # Cells not touched by the outline are entirely inside or outside
+        touched_cells = self.cells_touched_by_outline(
+            flattened_path, x_min, y_min, cell_width, cell_height, grid_cols, grid_rows
+        )
+        for row_index in range(grid_rows):
+            for col_index in range(grid_cols):
+                if (row_index, col_index) in touched_cells:
+                    coverage_grid.states[row_index][col_index] = 1  # partial
+                elif coverage_grid.coverage[row_index][col_index] > 0.5:
+                    coverage_grid.states[row_index][col_index] = 2  # full
+                else:
+                    coverage_grid.states[row_index][col_index] = 0  # empty
+
+    def cells_touched_by_outline(
+        self,
+        flattened_path: FlattenedPath,
+        x_min: float,
+        y_min: float,
+        cell_width: float,
+        cell_height: float,
+        grid_cols: int,
+        grid_rows: int,
+        include_borders: bool = False
+    ) -> set[tuple[int, int]]:
+        """Return the (row, col) of every cell whose interior an outline edge crosses.
+
+        Args:
+            flattened_path: Flattened outline
+            x_min: Left edge of the grid
+            y_min: Top edge of the grid
+            cell_width: Width of a cell
+            cell_height: Height of a cell
+            grid_cols: Number of columns
+            grid_rows: Number of rows
+            include_borders: Let edges running exactly along a cell border
+                touch the cells on both sides
+
+        Returns:
+            Set of touched cells
+
+        Note:
+            By default, edges running exactly along cell borders do not
+            touch either cell.
+            The grid is only described, never allocated, so its cost follows
+            the number of touched cells rather than the grid's area.
+        """
+
+        def open_cell_range(start: float, end: float, count: int) -> range:
+            # Cells (in cell units) whose open interior intersects [start, end]
+            if start == end:
+                if start == int(start):
+                    if not include_borders:
+                        return range(0)
+                    first, last = int(start) - 1, int(start)
+                else:
+                    first, last = math.floor(start), math.floor(start)
+            else:
+                first, last = math.floor(start), math.ceil(end) - 1
+            return range(max(0, first), min(count - 1, last) + 1)
+
+        touched_cells = set()
+        for start_x, start_y, end_y, inverse_slope, winding in flattened_path.edges:
+            # Edge in cell units
+            low_y = (start_y - y_min) / cell_height
+            high_y = (end_y - y_min) / cell_height
+            for row_index in open_cell_range(low_y, high_y, grid_rows):
+                # Portion of the edge inside this cell row
+                row_low_y = y_min + max(low_y, row_index) * cell_height
+                row_high_y = y_min + min(high_y, row_index + 1) * cell_height
+                row_x_a = (start_x + (row_low_y - start_y) * inverse_slope - x_min) / cell_width
+                row_x_b = (start_x + (row_high_y - start_y) * inverse_slope - x_min) / cell_width
+                for col_index in open_cell_range(min(row_x_a, row_x_b), max(row_x_a, row_x_b), grid_cols):
+                    touched_cells.add((row_index, col_index))
+
+        for start_x, end_x, edge_y in flattened_path.horizontal_edges:
+            for row_index in open_cell_range((edge_y - y_min) / cell_height, (edge_y - y_min) / cell_height, grid_rows):
+                col_range = open_cell_range(
+                    (start_x - x_min) / cell_width, (end_x - x_min) / cell_width, grid_cols
+                )
+                for col_index in col_range:
+                    touched_cells.add((row_index, col_index))
+
+        return touched_cells
+
+    def create_density_field(
+        self,
+        bbox,
+        flattened_path: FlattenedPath,
+        cell_size: float,
+        user_units_per_mm: float
+    ) -> DensityField | None:
+        """Sample the density map selected by --density_map over the shape's bounding box.
+
+        Args:
+            bbox: Bounding box of the shape
+            flattened_path: Flattened outline of the shape
+            cell_size: Approximate raster cell size in user units
+            user_units_per_mm: Document user units per millimeter
+
+        Returns:
+            DensityField, or None without a density map
+
+        Note:
+            "edges" falls off linearly from 1 on the outline (holes
+            included) to 0 at --density_falloff millimeters inside,
+            "gradient" rises linearly from 0 to 1 across the bounding box
+            in the direction of --density_angle, and "image" reads the
+            grayscale image --density_image stretched over the bounding
+            box, black being the densest. The map is then inverted on
+            request and raised to the --density_background minimum.
+        """
+        density_map = self.options.density_map
+        if density_map == "none":
+            return None
+
+        cols = max(1, math.ceil(bbox.width / cell_size))
+        rows = max(1, math.ceil(bbox.height / cell_size))
+        cell_width = bbox.width / cols or cell_size
+        cell_height = bbox.height / rows or cell_size
+
+        if density_map == "edges":
+            falloff = self.options.density_falloff * user_units_per_mm
+            distances = self.outline_distances(flattened_path, bbox.left, bbox.top, cell_width, cell_height, cols, rows)
+            values = [[max(0.0, 1.0 - distance / falloff) for distance in row] for row in distances]
+        elif density_map == "gradient":
+            direction_x = math.cos(math.radians(self.options.density_angle))
+            direction_y = math.sin(math.radians(self.options.density_angle))
+            # Projections of the bounding box corners span the gradient
+            half_extent = (abs(direction_x) * bbox.width + abs(direction_y) * bbox.height) / 2 or 1.0
+            values = [
+                [
+                    0.5 + (
+                        ((col_index + 0.5) * cell_width - bbox.width / 2) * direction_x
+                        + ((row_index + 0.5) * cell_height - bbox.height / 2) * direction_y
+                    ) / (2 * half_extent)
+                    for col_index in range(cols)
+                ]
+                for row_index in range(rows)
+            ]
+        else:
+            # Box filter: each raster cell gets the mean gray of the pixels it covers
+            with Image.open(self.options.density_image) as density_image:
+                gray_values = density_image.convert("L").resize((cols, rows), Image.BOX).tobytes()
+            values = [
+                [1.0 - gray_value / 255.0 for gray_value in gray_values[row_index * cols:(row_index + 1) * cols]]
+                for row_index in range(rows)
+            ]
+
+        background = self.options.density_background / 100.0
+        if self.options.density_invert:
+            values = [[1.0 - value for value in row] for row in values]
+        values = [[background + (1.0 - background) * value for value in row] for row in values]
+        return DensityField(bbox.left, bbox.top, cell_width, cell_height, values)
+
+    def outline_distances(
+        self,
+        flattened_path: FlattenedPath,
+        x_min: float,
+        y_min: float,
+        cell_width: float,
+        cell_height: float,
+        grid_cols: int,
+        grid_rows: int
+    ) -> list[list[float]]:
+        """Return the approximate distance from every cell of a grid to the outline.
+
+        Args:
+            flattened_path: Flattened outline
+            x_min: Left edge of the grid
+            y_min: Top edge of the grid
+            cell_width: Width of a cell
+            cell_height: Height of a cell
+            grid_cols: Number of columns
+            grid_rows: Number of rows
+
+        Returns:
+            Distance per cell, indexed as [row][col]
+
+        Note:
+            Cells crossed by the outline are at distance 0; the others are
+            reached by a two-pass chamfer transform with straight and
+            diagonal steps, within a few percent of the Euclidean distance
+            and a cell of the true distance to the outline.
+        """
+        diagonal_step = math.hypot(cell_width, cell_height)
+        distances = [[math.inf] * grid_cols for _ in range(grid_rows)]
+        for row_index, col_index in self.cells_touched_by_outline(
+            flattened_path, x_min, y_min, cell_width, cell_height, grid_cols, grid_rows, include_borders=True
+        ):
+            distances[row_index][col_index] = 0.0
+
+        # Forward pass from the top-left neighbours, backward pass from the bottom-right ones
+        passes = (
+            (range(grid_rows), range(grid_cols), -1),
+            (range(grid_rows - 1, -1, -1), range(grid_cols - 1, -1, -1), 1)
+        )
+        for row_range, col_range, step in passes:
+            for row_index in row_range:
+                row = distances[row_index]
+                neighbour_row_index = row_index + step
+                neighbour_row = distances[neighbour_row_index] if 0 <= neighbour_row_index < grid_rows else None
+                for col_index in col_range:
+                    distance = row[col_index]
+                    neighbour_col_index = col_index + step
+                    has_neighbour_col = 0 <= neighbour_col_index < grid_cols
+                    if has_neighbour_col:
+                        distance = min(distance, row[neighbour_col_index] + cell_width)
+                    if neighbour_row is not None:
+                        distance = min(distance, neighbour_row[col_index] + cell_height)
+                        if has_neighbour_col:
+                            distance = min(distance, neighbour_row[neighbour_col_index] + diagonal_step)
+                        if 0 <= col_index - step < grid_cols:
+                            distance = min(distance, neighbour_row[col_index - step] + diagonal_step)
+                    row[col_index] = distance
+        return distances
+
+    def create_cell_sampler(
+        self,
+        coverage_grid: CoverageGrid,
+        density_field: DensityField | None = None
+    ) -> WeightedSampler:
+        """Build the weighted sampler used to pick grid cells for placement.
+
+        Args:
+            coverage_grid: Coverage grid with cell classifications
+            density_field: Density map multiplying the weight of each cell
+                by its mean density, or None
+
+        Returns:
+            WeightedSampler over every non-empty cell ((row, col) for a
+            CoverageGrid, leaf node for a CoverageQuadtree)
+
+        Note:
+            With exact coverage, cells are weighted by their coverage fraction
+            (partial cells keep a small minimum weight so thin features still
+            get spots) times their area. With sampled coverage, full cells (2)
+            are weighted FULL_CELL_WEIGHT times more heavily than partial
+            cells (1).
+        """
+        cells = coverage_grid.cells_with_state(1, 2)
+        density_weights = [1.0] * len(cells)
+        if density_field is not None:
+            density_weights = [density_field.mean_in_box(coverage_grid.cell_box(cell)) for cell in cells]
+        weights = []
+        for cell, density_weight in zip(cells, density_weights):
+            cell_state = coverage_grid.cell_state(cell)
+            if coverage_grid.exact_coverage:
+                cell_weight = coverage_grid.cell_coverage(cell)
+                if cell_state == 1:
+                    cell_weight = max(MIN_PARTIAL_CELL_WEIGHT, cell_weight)
+            else:
+                cell_weight = FULL_CELL_WEIGHT if cell_state == 2 else 1.0
+            weights.append(cell_weight * coverage_grid.cell_area(cell) * density_weight)
+        return WeightedSampler(cells, weights)
+
+    def place_points(
+        self,
+        point_rngs: list[random.Random],
+        draw_candidate,
+        coverage_grid: CoverageGrid,
+        flattened_path: FlattenedPath,
+        max_rounds: int,
+        stats_name: str
+    ) -> list[tuple | None]:
+        """Place one point per random generator inside the shape, retrying in rounds.
+
+        Args:
+            point_rngs: Random generator of each point (the same generator
+                may be shared by several points)
+            draw_candidate: Function taking a random generator and returning
+                (x, y, payload, cell_state) of a candidate point
+            coverage_grid: Coverage grid with cell classifications
+            flattened_path: Flattened outline to test points against
+            max_rounds: Maximum number of rounds before giving up on the
+                remaining points
+            stats_name: Prefix of the statistics recorded for these points
+
+        Returns:
+            (x, y, payload) per generator, in the same order as point_rngs;
+            None for points that could not be placed
+
+        Note:
+            Each round draws one candidate per missing point from that
+            point's own generator, in order; candidates in full cells are
+            accepted directly and the rest are tested in one batch. With a
+            generator per point, each point is a pure function of its
+            generator, whatever the other points do.
+        """
+        points = [None] * len(point_rngs)
+        pending_indices = list(range(len(point_rngs)))
+        for round_number in range(max_rounds):
+            if not pending_indices:
+                break
+            self.stats.count(f"{stats_name}_candidates", len(pending_indices))
+
+            candidates = [draw_candidate(point_rngs[point_index]) for point_index in pending_indices]
+
+            # Full cells skip the point-in-path test; partial ones are tested in batch
+            partial_indices = [
+                candidate_index for candidate_index, candidate in enumerate(candidates) if candidate[3] == 1
+            ]
+            inside_mask = self.points_in_path(
+                [candidates[candidate_index][0] for candidate_index in partial_indices],
+                [candidates[candidate_index][1] for candidate_index in partial_indices],
+                flattened_path
+            )
+            accepted = [candidate[3] == 2 for candidate in candidates]
+            for candidate_index, inside in zip(partial_indices, inside_mask):
+                accepted[candidate_index] = bool(inside)
+
+            still_pending = []
+            for point_index, candidate, is_accepted in zip(pending_indices, candidates, accepted):
+                if is_accepted:
+                    points[point_index] = candidate[:3]
+                else:
+                    still_pending.append(point_index)
+            self.stats.record(
+                f"{stats_name}_acceptance_round", round_number + 1, len(pending_indices) - len(still_pending)
+            )
+            pending_indices = still_pending
+
+        self.stats.count(f"{stats_name}_accepted", len(points) - len(pending_indices))
+        self.stats.count(f"{stats_name}_failed", len(pending_indices))
+        return points
+
+    def uniform_candidate(
+        self,
+        coverage_grid: CoverageGrid,
+        cell_sampler: WeightedSampler,
+        rng: random.Random
+    ) -> tuple[float, float, None, int]:
+        """Draw a candidate point from the cell sampler (see place_points())."""
+        cell = cell_sampler.sample(rng)
+        point_x, point_y = coverage_grid.random_point_in_cell(cell, rng)
+        return point_x, point_y, None, coverage_grid.cell_state(cell)
+
+    def generate_valid_points(
+        self,
+        count: int,
+        coverage_grid: CoverageGrid,
+        flattened_path: FlattenedPath,
+        rng: random.Random,
+        max_retries: int = MAX_POINT_GENERATION_RETRIES,
+        cell_sampler: WeightedSampler | None = None
+    ) -> list[tuple[float, float]]:
+        """Generate points inside the shape using batched grid-guided sampling.
+
+        Args:
+            count: Number of points to generate
+            coverage_grid: Coverage grid with cell classifications
+            flattened_path: Flattened outline to test points against
+            rng: Random generator for cell and position draws
+            max_retries: Maximum number of attempts per point before giving up
+            cell_sampler: Sampler from create_cell_sampler(), built on demand if omitted
+
+        Returns:
+            List of (x, y) coordinates, shorter than count if some points failed
+        """
+        if cell_sampler is None:
+            cell_sampler = self.create_cell_sampler(coverage_grid)
+
+        # Early return if no valid cells
+        if not cell_sampler:
+            return []
+
+        points = self.place_points(
+            [rng] * count, functools.partial(self.uniform_candidate, coverage_grid, cell_sampler),
+            coverage_grid, flattened_path, max_retries, "uniform"
+        )
+        return [(point[0], point[1]) for point in points if point is not None]
+
+    def create_cluster_sampler(
+        self,
+        clusters: list[tuple[float, float, float, float]],
+        coverage_grid: CoverageGrid,
+        flattened_path: FlattenedPath,
+        density_field: DensityField | None = None
+    ) -> WeightedSampler:
+        """Build the sampler of cluster regions that lie inside the shape.
+
+        Args:
+            clusters: List of (center_x, center_y, radius, weight) tuples
+            coverage_grid: Coverage grid with cell classifications
+            flattened_path: Flattened outline to test points against
+            density_field: Density map multiplying the weight of each bin
+                by the density at its center, or None
+
+        Returns:
+            WeightedSampler over (cluster_index, ring_index, sector_index)
+            of every polar bin touching the shape
+
+        Note:
+            Each cluster disc is divided into CLUSTER_MASK_RINGS rings and
+            CLUSTER_MASK_SECTORS sectors. A bin weighs the cluster weight
+            times the probability of its ring under the exponential distance
+            distribution (rate 2 / radius, truncated at the radius; ring
+            weights need no normalization), so
+            drawing bins and then points within them reproduces the
+            cluster's falloff. Bins are kept when the center or a corner of
+            the bin lies inside the shape (grid lookup, point tests only in
+            partial cells); their weight is not reduced by the part outside,
+            which the caller rejects, so the result stays the falloff
+            restricted to the shape.
+        """
+        ring_fractions = [ring_index / CLUSTER_MASK_RINGS for ring_index in range(CLUSTER_MASK_RINGS + 1)]
+        ring_cumulative = [1 - math.exp(-2 * fraction) for fraction in ring_fractions]
+        sector_angle = 2 * math.pi / CLUSTER_MASK_SECTORS
+
+        # Center and corners of every bin, in polar coordinates relative to the cluster
+        bin_probes = []
+        for ring_index in range(CLUSTER_MASK_RINGS):
+            inner_fraction, outer_fraction = ring_fractions[ring_index], ring_fractions[ring_index + 1]
+            for sector_index in range(CLUSTER_MASK_SECTORS):
+                start_angle = sector_index * sector_angle
+                end_angle = start_angle + sector_angle
+                bin_probes.append((ring_index, sector_index, [
+                    ((inner_fraction + outer_fraction) / 2, start_angle + sector_angle / 2),
+                    (inner_fraction, start_angle), (inner_fraction, end_angle),
+                    (outer_fraction, start_angle), (outer_fraction, end_angle)
+                ]))
+
+        bins = []
+        weights = []
+        probe_xs = []
+        probe_ys = []
+        probe_bins = []
+        for cluster_index, (center_x, center_y, radius, cluster_weight) in enumerate(clusters):
+            for ring_index, sector_index, probes in bin_probes:
+                bin_index = len(bins)
+                bins.append((cluster_index, ring_index, sector_index))
+                weights.append(0.0)
+                bin_weight = cluster_weight * (ring_cumulative[ring_index + 1] - ring_cumulative[ring_index])
+                if density_field is not None:
+                    center_fraction, center_angle = probes[0]
+                    bin_weight *= density_field.value_at(
+                        center_x + center_fraction * radius * math.cos(center_angle),
+                        center_y + center_fraction * radius * math.sin(center_angle)
+                    )
+                for fraction, angle in probes:
+                    probe_x = center_x + fraction * radius * math.cos(angle)
+                    probe_y = center_y + fraction * radius * math.sin(angle)
+                    probe_state = coverage_grid.state_at(probe_x, probe_y)
+                    if probe_state == 2:
+                        weights[bin_index] = bin_weight
+                    elif probe_state == 1:
+                        probe_xs.append(probe_x)
+                        probe_ys.append(probe_y)
+                        probe_bins.append((bin_index, bin_weight))
+
+        # Probes in partial cells are tested against the outline in one batch
+        inside_mask = self.points_in_path(probe_xs, probe_ys, flattened_path)
+        for (bin_index, bin_weight), inside in zip(probe_bins, inside_mask):
+            if inside:
+                weights[bin_index] = bin_weight
+
+        return WeightedSampler(bins, weights)
+
+    def cluster_candidate(
+        self,
+        clusters: list[tuple[float, float, float, float]],
+        cluster_sampler: WeightedSampler,
+        coverage_grid: CoverageGrid,
+        rng: random.Random
+    ) -> tuple[float, float, int, int]:
+        """Draw a candidate point from the cluster sampler (see place_points()).
+
+        Note:
+            The distance from the cluster center is drawn within the chosen
+            ring by inverting the exponential distribution, the angle
+            uniformly within the chosen sector. Clusters spill over the
+            outline, so with sampled coverage, where "full" cells are only
+            mostly inside, every candidate is tested against the outline.
+        """
+        cluster_index, ring_index, sector_index = cluster_sampler.sample(rng)
+        center_x, center_y, radius = clusters[cluster_index][:3]
+
+        ring_start = 1 - math.exp(-2 * ring_index / CLUSTER_MASK_RINGS)
+        ring_end = 1 - math.exp(-2 * (ring_index + 1) / CLUSTER_MASK_RINGS)
+        distance = -radius / 2 * math.log(1 - rng.uniform(ring_start, ring_end))
+        polar_angle = (sector_index + rng.random()) * 2 * math.pi / CLUSTER_MASK_SECTORS
+
+        point_x = center_x + distance * math.cos(polar_angle)
+        point_y = center_y + distance * math.sin(polar_angle)
+        cell_state = coverage_grid.state_at(point_x, point_y)
+        if cell_state == 2 and not coverage_grid.exact_coverage:
+            cell_state = 1
+        return point_x, point_y, cluster_index, cell_state
+
+    def generate_cluster_points(
+        self,
+        point_rngs: list[random.Random],
+        clusters: list[tuple[float, float, float, float]],
+        coverage_grid: CoverageGrid,
+        flattened_path: FlattenedPath,
+        max_attempts: int = MAX_CLUSTER_POINT_ATTEMPTS,
+        cluster_sampler: WeightedSampler | None = None
+    ) -> list[tuple[float, float, int] | None]:
+        """Generate points around cluster centers, drawn from the in-shape cluster regions.
+
+        Args:
+            point_rngs: Random generator of each point
+            clusters: List of (center_x, center_y, radius, weight) tuples
+            coverage_grid: Coverage grid with cell classifications
+            flattened_path: Flattened outline to test points against
+            max_attempts: Maximum number of rounds before giving up on the
+                remaining points
+            cluster_sampler: Sampler from create_cluster_sampler(), built on
+                demand if omitted
+
+        Returns:
+            (x, y, cluster_index) per generator, None for points that failed
+
+        Note:
+            Distance from the cluster center follows an exponential
+            distribution (more concentrated at center) truncated at the
+            cluster radius. Points are only drawn from the parts of each
+            cluster that touch the shape (see create_cluster_sampler()), so
+            clusters against concave edges or holes keep their spots
+            instead of losing them to rejection.
+        """
+        if not clusters or not point_rngs:
+            return [None] * len(point_rngs)
+
+        if cluster_sampler is None:
+            cluster_sampler = self.create_cluster_sampler(clusters, coverage_grid, flattened_path)
+        if not cluster_sampler:
+            return [None] * len(point_rngs)
+
+        return self.place_points(
+            point_rngs, functools.partial(self.cluster_candidate, clusters, cluster_sampler, coverage_grid),
+            coverage_grid, flattened_path, max_attempts, "cluster"
+        )
+
+    def create_clusters(
+        self,
+        coverage_grid: CoverageGrid,
+        bbox,
+        rng: random.Random,
+        density_field: DensityField | None = None
+    ) -> list[tuple[float, float, float, float]]:
+        """Draw the cluster centers, radii and weights of one shape.
+
+        Args:
+            coverage_grid: Coverage grid with cell classifications
+            bbox: Bounding box of the shape
+            rng: Random generator of the shape
+            density_field: Density map making dense cells likelier
+                cluster centers, or None
+
+        Returns:
+            List of (center_x, center_y, radius, weight) tuples, empty if
+            the shape covers no grid cell
+        """
+        bbox_width, bbox_height = bbox.width, bbox.height
+        clustering_factor = self.options.clustering / 100.0
+        num_clusters = self.options.num_clusters
+
+        # Generate cluster centers (only in non-empty cells)
+        clusters = []
+        non_empty_cells = coverage_grid.cells_with_state(1, 2)  # partial or full cells
+        cell_areas = [coverage_grid.cell_area(cell) for cell in non_empty_cells]
+        if density_field is not None:
+            cell_areas = [
+                cell_area * density_field.mean_in_box(coverage_grid.cell_box(cell))
+                for cell, cell_area in zip(non_empty_cells, cell_areas)
+            ]
+
+        if non_empty_cells and sum(cell_areas) > 0:
+            for cluster_index in range(num_clusters):
+                # Pick random non-empty cell for cluster center, larger (and denser) cells more often
+                cell = rng.choices(non_empty_cells, cell_areas)[0]
+
+                # Place cluster center randomly within chosen cell
+                cluster_center_x, cluster_center_y = coverage_grid.random_point_in_cell(cell, rng)
+
+                # Calculate cluster radius (smaller at high clustering values for tighter groups)
+                cluster_radius = (
+                    min(bbox_width, bbox_height)
+                    * rng.uniform(0.05, 0.15)
+                    * (1.5 - clustering_factor)
+                )
+
+                # Assign random weight for cluster selection probability
+                cluster_weight = rng.uniform(0.5, 2.0)
+
+                clusters.append((cluster_center_x, cluster_center_y, cluster_radius, cluster_weight))
+        return clusters
+
+    def generate_scattered_points(
+        self,
+        spot_rngs: list[random.Random],
+        coverage_grid: CoverageGrid,
+        flattened_path: FlattenedPath,
+        clusters: list[tuple[float, float, float, float]],
+        cluster_sampler: WeightedSampler | None = None,
+        cell_sampler: WeightedSampler | None = None
+    ) -> list[tuple[float, float, int | None] | None]:
+        """Place spots independently, around cluster centers or uniformly.
+
+        Args:
+            spot_rngs: Random generator of each spot to place
+            coverage_grid: Coverage grid with cell classifications
+            flattened_path: Flattened outline to test points against
+            clusters: Clusters returned by create_clusters()
+            cluster_sampler: Sampler from create_cluster_sampler(), built on
+                demand if omitted
+            cell_sampler: Sampler from create_cell_sampler(), built on demand
+                if omitted
+
+        Returns:
+            (x, y, cluster_index) per spot, in the same order as spot_rngs,
+            cluster_index being None for uniformly placed spots; None for
+            spots that could not be placed
+
+        Note:
+            The share of clustered spots grows with the square root of the
+            clustering option; clustered spots that fail to find room fall
+            back to the uniform distribution. Every decision about a spot
+            is drawn from its own generator, so a spot only depends on the
+            shape, the options and its generator, not on the number of
+            spots.
+        """
+        # Decide which spots use clustering (non-linear for stronger effect)
+        clustering_probability = (self.options.clustering / 100.0) ** 0.5
+        clustered_indices = []
+        if clusters:
+            clustered_indices = [
+                spot_index for spot_index, spot_rng in enumerate(spot_rngs)
+                if spot_rng.random() < clustering_probability
+            ]
+
+        # Place clustered spots first, then fall back to uniform distribution for
+        # the remaining spots, including clustered ones that failed
+        spot_points = [None] * len(spot_rngs)
+        cluster_points = self.generate_cluster_points(
+            [spot_rngs[spot_index] for spot_index in clustered_indices], clusters, coverage_grid, flattened_path,
+            cluster_sampler=cluster_sampler
+        )
+        for spot_index, cluster_point in zip(clustered_indices, cluster_points):
+            spot_points[spot_index] = cluster_point
+
+        uniform_indices = [spot_index for spot_index, spot_point in enumerate(spot_points) if spot_point is None]
+        if cell_sampler is None:
+            cell_sampler = self.create_cell_sampler(coverage_grid)
+        if cell_sampler:
+            uniform_points = self.place_points(
+                [spot_rngs[spot_index] for spot_index in uniform_indices],
+                functools.partial(self.uniform_candidate, coverage_grid, cell_sampler),
+                coverage_grid, flattened_path, MAX_POINT_GENERATION_RETRIES, "uniform"
+            )
+            for spot_index, uniform_point in zip(uniform_indices, uniform_points):
+                spot_points[spot_index] = uniform_point
+        return spot_points
+
+    def generate_poisson_points(
+        self,
+        count: int,
+        coverage_grid: CoverageGrid,
+        flattened_path: FlattenedPath,
+        size_range: tuple[float, float],
+        min_spacing: float,
+        spacing_by_size: bool,
+        rng: random.Random,
+        cell_sampler: WeightedSampler | None = None,
+        density_field: DensityField | None = None
+    ) -> list[tuple[float, float, float]]:
+        """Generate well-spaced points inside the shape with Bridson's algorithm.
+
+        Args:
+            count: Maximum number of points to generate
+            coverage_grid: Coverage grid with cell classifications
+            flattened_path: Flattened outline to test points against
+            size_range: (minimum, maximum) spot size, drawn per point
+            min_spacing: Minimum distance between spot centers, or between
+                spot edges with spacing_by_size
+            spacing_by_size: Add the radii of both spots to the spacing
+            rng: Random generator for seed, size and candidate draws
+            cell_sampler: Sampler from create_cell_sampler(), built on demand if omitted
+            density_field: Density map scaling the spacing, or None
+
+        Returns:
+            List of (x, y, size) tuples; shorter than count once the shape
+            is full at the requested spacing
+
+        Note:
+            Each new point is searched in the annulus between one and two
+            spacings around a random active point; a point whose
+            POISSON_CANDIDATES_PER_POINT candidates all fail is retired.
+            When no active point remains (disconnected parts, holes), a new
+            seed is drawn from the cell sampler; placement stops when none
+            of POISSON_RESEED_CANDIDATES candidates has room left.
+            With a density map, the spacing around a point is divided by
+            the square root of the density there (at least
+            POISSON_MIN_DENSITY), so the number of points per area follows
+            the map; no point is placed where the density is zero.
+        """
+        size_min, size_max = size_range
+        if cell_sampler is None:
+            cell_sampler = self.create_cell_sampler(coverage_grid, density_field)
+        if not cell_sampler:
+            return []
+
+        def clearance(spot_size: float) -> float:
+            if spacing_by_size:
+                return (spot_size + min_spacing) / 2
+            return min_spacing / 2
+
+        def spacing_scale(point_x: float, point_y: float) -> float | None:
+            # Clearance multiplier of the density map, None where it is empty
+            if density_field is None:
+                return 1.0
+            density = density_field.value_at(point_x, point_y)
+            if density <= 0:
+                return None
+            return 1.0 / math.sqrt(max(density, POISSON_MIN_DENSITY))
+
+        # Without any clearance there is nothing to enforce
+        max_clearance = clearance(size_max)
+        if max_clearance <= 0:
+            return [
+                (point_x, point_y, rng.uniform(size_min, size_max))
+                for point_x, point_y in self.generate_valid_points(
+                    count, coverage_grid, flattened_path, rng, cell_sampler=cell_sampler
+                )
+            ]
+
+        spatial_hash = SpatialHash(2 * max_clearance)
+        points = []
+        active = []
+        while len(points) < count:
+            if not active:
+                # (Re)seed: first candidate from the cell sampler with room left
+                seed_point = None
+                for point_x, point_y in self.generate_valid_points(
+                    POISSON_RESEED_CANDIDATES, coverage_grid, flattened_path, rng, cell_sampler=cell_sampler
+                ):
+                    spot_size = rng.uniform(size_min, size_max)
+                    point_scale = spacing_scale(point_x, point_y)
+                    if point_scale is None:
+                        continue
+                    seed_radius = clearance(spot_size) * point_scale
+                    if spatial_hash.is_free(point_x, point_y, seed_radius):
+                        seed_point = (point_x, point_y, spot_size)
+                        break
+                if seed_point is None:
+                    break
+                self.stats.count("poisson_reseeds")
+                spatial_hash.add(seed_point[0], seed_point[1], seed_radius)
+                points.append(seed_point)
+                active.append(seed_point)
+                continue
+
+            active_index = rng.randrange(len(active))
+            active_x, active_y, active_size = active[active_index]
+            active_scale = spacing_scale(active_x, active_y)
+            active_clearance = clearance(active_size) * active_scale
+
+            # Candidates in the annulus around the active point, tested against the shape in one batch
+            candidates = []
+            for candidate_index in range(POISSON_CANDIDATES_PER_POINT):
+                spot_size = rng.uniform(size_min, size_max)
+                min_distance = active_clearance + clearance(spot_size) * active_scale
+                distance = rng.uniform(min_distance, 2 * min_distance)
+                polar_angle = rng.uniform(0, 2 * math.pi)
+                candidates.append((
+                    active_x + distance * math.cos(polar_angle),
+                    active_y + distance * math.sin(polar_angle),
+                    spot_size
+                ))
+            candidate_states = [coverage_grid.state_at(candidate[0], candidate[1]) for candidate in candidates]
+            if not coverage_grid.exact_coverage:
+                # Sampled "full" cells may still reach outside the shape
+                candidate_states = [min(cell_state, 1) for cell_state in candidate_states]
+            partial_candidates = [
+                candidate for candidate, cell_state in zip(candidates, candidate_states) if cell_state == 1
+            ]
+            partial_inside = iter(self.points_in_path(
+                [candidate[0] for candidate in partial_candidates],
+                [candidate[1] for candidate in partial_candidates],
+                flattened_path
+            ))
+
+            new_point = None
+            examined_count = 0
+            for candidate, cell_state in zip(candidates, candidate_states):
+                examined_count += 1
+                if cell_state == 0 or (cell_state == 1 and not next(partial_inside)):
+                    continue
+                candidate_scale = spacing_scale(candidate[0], candidate[1])
+                if candidate_scale is None:
+                    continue
+                new_radius = clearance(candidate[2]) * candidate_scale
+                if spatial_hash.is_free(candidate[0], candidate[1], new_radius):
+                    new_point = candidate
+                    break
+            self.stats.count("poisson_candidates", examined_count)
+
+            if new_point is None:
+                # Retire the active point (swap-remove keeps this O(1))
+                active[active_index] = active[-1]
+                active.pop()
+                self.stats.count("poisson_retired")
+                continue
+            spatial_hash.add(new_point[0], new_point[1], new_radius)
+            points.append(new_point)
+            active.append(new_point)
+            self.stats.count("poisson_accepted")
+
+        return points
+
+    def effect(self) -> None:
+        """Main extension execution - generates weathered texture spots.
+
+        Processes every selected path, shape primitive, text or group and
+        generates texture spots within its boundaries using shape-aware
+        distribution with optional clustering and elongation.
+
+        Returns:
+            None
+
+        Note:
+            Geometry is flattened on the main thread, spots for each shape are
+            computed in a worker pool, and the SVG is assembled on the main
+            thread with one new group per shape. All geometry is handled in
+            document coordinates, so shapes with their own transform or inside
+            transformed groups need no preprocessing.
+        """
+        # Collect target shapes: paths, shape primitives, text and groups, plus
+        # spots groups of earlier runs, which are updated for their source shape
+        targets = []
+        for selected_element in self.svg.selected.values():
+            source_id = selected_element.get(SPOTS_SOURCE_ATTRIBUTE)
+            if source_id is not None:
+                source_element = self.svg.getElementById(source_id)
+                if source_element is None:
+                    inkex.errormsg(f"The shape weathered by {selected_element.get_id()} no longer exists")
+                    continue
+                targets.append((source_element, selected_element))
+            elif isinstance(selected_element, OUTLINE_ELEMENT_TYPES):
+                targets.append((selected_element, None))
+
+        # Early return: Check if any shape can be processed
+        if not targets:
+            inkex.errormsg("Please select a path, shape, text or group first")
+            return
+
+        if not self.check_density_map():
+            return
+
+        # Text is converted to outlines on first use, all at once
+        self.text_targets = [
+            element
+            for selected_element, spots_group in targets
+            for element in selected_element.iter()
+            if isinstance(element, TEXT_ELEMENT_TYPES)
+        ]
+        self.text_outlines = None
+
+        # Opt-in statistics, reported once all shapes are written
+        self.stats = RunStats(enabled=instrumentation_requested(self.options))
+        run_start_time = time.perf_counter()
+
+        # Seed 0 asks for a new texture on every run
+        base_seed = self.options.seed or random.SystemRandom().randrange(1, 2 ** 31)
+
+        cache = DiskCache(default_cache_directory()) if self.options.use_cache else None
+
+        # Flatten every outline once into picklable geometry (or load it from
+        # the geometry cache); each shape gets its own seed derived from the
+        # base seed and its selection index. Spots groups keep the seed they
+        # were generated with unless another seed is set, and only the spots
+        # that changed are generated again.
+        user_units_per_mm = self.svg.unittouu("1mm")
+        shape_jobs = []
+        job_targets = []
+        with self.stats.timer("flatten"):
+            for shape_index, (selected_element, spots_group) in enumerate(targets):
+                previous_run = self.previous_run(spots_group)
+                if previous_run is not None and self.options.seed in (0, previous_run["base_seed"]):
+                    seed, run_base_seed = previous_run["seed"], previous_run["base_seed"]
+                else:
+                    seed, run_base_seed = shape_seed(base_seed, shape_index), base_seed
+
+                shape_job = self.prepare_shape_job(selected_element, seed, user_units_per_mm, cache)
+                if shape_job is None:
+                    inkex.errormsg(f"{selected_element.get_id()} has no closed outline, skipped")
+                    self.stats.count("shapes_without_outline")
+                    continue
+                shape_job.first_spot = self.reusable_spot_count(
+                    previous_run, shape_job.flattened_path.fingerprint(), seed, user_units_per_mm
+                )
+                shape_jobs.append(shape_job)
+                job_targets.append((selected_element, spots_group, run_base_seed))
+        self.stats.count("shapes", len(shape_jobs))
+        self.stats.count("spots_reused", sum(shape_job.first_spot for shape_job in shape_jobs))
+
+        if self.options.stream_output:
+            # Spots are generated while the document is saved, see save()
+            for stream_index, ((selected_element, spots_group, run_base_seed), shape_job) in enumerate(
+                zip(job_targets, shape_jobs)
+            ):
+                if spots_group is None:
+                    spots_group = selected_element.getparent().add(inkex.Group())
+                self.prepare_spots_group(spots_group, shape_job.first_spot)
+                self.record_run(spots_group, selected_element, shape_job, run_base_seed, user_units_per_mm)
+                spots_group.append(etree.Comment(STREAM_PLACEHOLDER.format(stream_index)))
+                self.streamed_jobs.append(shape_job)
+            self.stream_context = (user_units_per_mm, cache, run_start_time)
+            return
+
+        with self.stats.timer("generate"):
+            shape_spots = self.run_shape_jobs(shape_jobs, user_units_per_mm, cache)
+
+        with self.stats.timer("write"):
+            for (selected_element, spots_group, run_base_seed), shape_job, spots in zip(
+                job_targets, shape_jobs, shape_spots
+            ):
+                if spots_group is None:
+                    spots_group = selected_element.getparent().add(inkex.Group())
+                self.write_spots(spots_group, spots, shape_job.first_spot)
+                self.record_run(spots_group, selected_element, shape_job, run_base_seed, user_units_per_mm)
+                self.stats.count("spots_written", len(spots))
+
+        if self.stats.enabled:
+            self.stats.timers["run"] = time.perf_counter() - run_start_time
+            self.report_stats()
+
+    def save(self, stream) -> None:
+        """Save the document, streaming in the spots of --stream_output runs.
+
+        Args:
+            stream: Binary output stream
+
+        Note:
+            The document is serialized without the streamed spots and split
+            at the placeholder comment left in each spots group; the spots of
+            each shape are then generated chunk by chunk and written straight
+            to the output, so they are never held in the document or in memory
+            all at once. Streamed shapes are computed in-process and bypass
+            the result cache.
+        """
+        if not self.streamed_jobs:
+            super().save(stream)
+            return
+
+        user_units_per_mm, cache, run_start_time = self.stream_context
+        root = self.document.getroot()
+        svg_prefix = next(
+            (prefix for prefix, namespace in root.nsmap.items() if namespace == inkex.NSS["svg"]), None
+        )
+        path_tag = f"{svg_prefix}:path" if svg_prefix else "path"
+
+        # Placeholders appear in document order, which need not be selection
+        # order; splitting on the captured index alternates text and index
+        placeholder_pattern = etree.tostring(etree.Comment(STREAM_PLACEHOLDER.format("([0-9]+)")))
+        document_parts = re.split(placeholder_pattern, root.tostring())
+        with self.stats.timer("generate"):
+            stream.write(document_parts[0])
+            for stream_index, document_part in zip(document_parts[1::2], document_parts[2::2]):
+                shape_job = self.streamed_jobs[int(stream_index)]
+                spot_sink = StreamSpotSink(stream.write, self.options.output_mode, path_tag)
+                for spots in self.iter_shape_spot_chunks(shape_job, user_units_per_mm, cache):
+                    spot_sink.add(spots)
+                    self.stats.count("spots_written", len(spots))
+                spot_sink.close()
+                stream.write(document_part)
+
+        if self.stats.enabled:
+            self.stats.timers["run"] = time.perf_counter() - run_start_time
+            self.report_stats()
+
+    def report_stats(self) -> None:
+        """Report the collected statistics.
+
+        Note:
+            The summary goes to Inkscape's message window (stderr when run
+            from the command line). With $TIMEWORN_STATS_FILE set, the
+            statistics are also appended to that file as one JSON line per
+            run, together with the options (input file included).
+        """
+        inkex.errormsg("\n".join(self.stats.report_lines()))
+
+        stats_path = os.environ.get("TIMEWORN_STATS_FILE")
+        if not stats_path:
+            return
+        stats_record = self.stats.to_json()
+        stats_record["options"] = vars(self.worker_options())
+        try:
+            with open(stats_path, "a", encoding="utf-8") as stats_file:
+                stats_file.write(json.dumps(stats_record, sort_keys=True) + "\n")
+        except OSError as error:
+            inkex.errormsg(f"Could not write statistics to {stats_path}: {error}")
+
+    def check_density_map(self) -> bool:
+        """Validate the density map options before any shape is processed.
+
+        Returns:
+            False, after reporting the problem, if spots cannot follow the
+            selected density map
+
+        Note:
+            A relative image path is resolved against the document's
+            directory, as workers and the batch script may run elsewhere.
+            A digest of the image is added to the options, so the spots
+            cache and updated spots groups notice when the image changes.
+        """
+        density_map = self.options.density_map
+        if density_map == "edges" and self.options.density_falloff <= 0:
+            inkex.errormsg("The edge falloff of the density map must be greater than 0")
+            return False
+        if density_map != "image":
+            return True
+
+        if Image is None:
+            inkex.errormsg("Image density maps need the Pillow package (pip install Pillow)")
+            return False
+        if not self.options.density_image:
+            inkex.errormsg("Please choose the image of the density map")
+            return False
+        density_image = self.absolute_href(self.options.density_image)
+        try:
+            with Image.open(density_image) as image:
+                image.verify()
+            with open(density_image, "rb") as image_file:
+                image_digest = hashlib.sha256(image_file.read()).hexdigest()
+        except (OSError, SyntaxError):
+            inkex.errormsg(f"Could not read the density image {self.options.density_image}")
+            return False
+        self.options.density_image = density_image
+        self.options.density_image_digest = image_digest
+        return True
+
+    def record_run(
+        self,
+        spots_group,
+        source_element,
+        shape_job: ShapeJob,
+        base_seed: int,
+        user_units_per_mm: float
+    ) -> None:
+        """Record on a spots group what its spots were generated from.
+
+        Args:
+            spots_group: Spots group being written
+            source_element: Weathered element
+            shape_job: Shape prepared by prepare_shape_job()
+            base_seed: Base seed of the run that chose the shape's seed
+            user_units_per_mm: Document user units per millimeter
+
+        Note:
+            Read back by previous_run() to update the group incrementally.
+        """
+        spots_group.set(SPOTS_SOURCE_ATTRIBUTE, source_element.get_id())
+        spots_group.set(SPOTS_VERSION_ATTRIBUTE, str(SPOTS_CACHE_VERSION))
+        spots_group.set(SPOTS_SEED_ATTRIBUTE, str(shape_job.seed))
+        spots_group.set(SPOTS_BASE_SEED_ATTRIBUTE, str(base_seed))
+        spots_group.set(SPOTS_GEOMETRY_ATTRIBUTE, shape_job.flattened_path.fingerprint())
+        spots_group.set(SPOTS_OPTIONS_ATTRIBUTE, json.dumps(
+            self.recorded_options(user_units_per_mm), sort_keys=True
+        ))
 
-# Geometry configuration
-BEZIER_FLATTEN_SEGMENTS = 8
+    def recorded_options(self, user_units_per_mm: float) -> dict:
+        """Return the options recorded on spots groups (see reusable_spot_count())."""
+        recorded_options = spot_options(self.worker_options())
+        recorded_options["output_mode"] = self.options.output_mode
+        recorded_options["user_units_per_mm"] = user_units_per_mm
+        return json.loads(json.dumps(recorded_options))
 
-# Distribution configuration
-MAX_POINT_GENERATION_RETRIES = 50
-MAX_CLUSTER_POINT_ATTEMPTS = 50
+    def previous_run(self, spots_group) -> dict | None:
+        """Read the generation record of a spots group written by an earlier run.
 
-class Timeworn(inkex.EffectExtension):
-    
-    def add_arguments(self, pars):
-        pars.add_argument("--tabs", default="objects")
-        pars.add_argument("--density", type=int, default=200)
-        pars.add_argument("--size_min", type=float, default=0.5)
-        pars.add_argument("--size_max", type=float, default=3.0)
-        pars.add_argument("--irregularity", type=int, default=50)
-        pars.add_argument("--shape_type", default="organic")
-        pars.add_argument("--clustering", type=int, default=30)
-        pars.add_argument("--num_clusters", type=int, default=5)
-        pars.add_argument("--elongation", type=float, default=1.5)
-        pars.add_argument("--elongation_variation", type=int, default=30)
-        pars.add_argument("--elongation_angle", type=float, default=45.0)
-        pars.add_argument("--angle_variation", type=int, default=30)
+        Args:
+            spots_group: Spots group, or None
 
-    def flatten_bezier(
+        Returns:
+            Dict with "version", "seed", "base_seed", "geometry" and
+            "options", or None without a group or with an unreadable record
+        """
+        if spots_group is None:
+            return None
+        try:
+            return {
+                "version": int(spots_group.get(SPOTS_VERSION_ATTRIBUTE)),
+                "seed": int(spots_group.get(SPOTS_SEED_ATTRIBUTE)),
+                "base_seed": int(spots_group.get(SPOTS_BASE_SEED_ATTRIBUTE)),
+                "geometry": spots_group.get(SPOTS_GEOMETRY_ATTRIBUTE),
+                "options": json.loads(spots_group.get(SPOTS_OPTIONS_ATTRIBUTE)),
+            }
+        except (TypeError, ValueError):
+            return None
+
+    def reusable_spot_count(
         self,
-        p0: tuple[float, float],
-        p1: tuple[float, float],
-        p2: tuple[float, float],
-        p3: tuple[float, float],
-        segments: int = BEZIER_FLATTEN_SEGMENTS
-    ) -> list[tuple[float, float]]:
-        """Flatten a cubic Bézier curve into line segments.
+        previous_run: dict | None,
+        geometry_fingerprint: str,
+        seed: int,
+        user_units_per_mm: float
+    ) -> int:
+        """Return how many spots of an earlier run can be kept as they are.
 
         Args:
-            p0: Start point (x, y)
-            p1: First control point (x, y)
-            p2: Second control point (x, y)
-            p3: End point (x, y)
-            segments: Number of segments to subdivide the curve into
+            previous_run: Record returned by previous_run(), or None
+            geometry_fingerprint: Fingerprint of the shape's current outline
+            seed: Seed the shape is weathered with now
+            user_units_per_mm: Document user units per millimeter
 
         Returns:
-            List of points forming the flattened curve
+            Number of leading spot indices whose spots are unchanged
 
         Note:
-            Uses standard cubic Bézier formula for interpolation.
+            Spot i only depends on the geometry, the seed, the options other
+            than density and i itself (see generate_spots()). When only the
+            density changed, the spots below both densities are kept, so
+            raising the density generates the new spots only and lowering
+            it generates nothing. Any other change regenerates every spot.
+            Merged output modes do not record spot indices and are always
+            rewritten.
         """
-        points = []
-        for segment_index in range(segments + 1):
-            t = segment_index / segments
-            # Cubic Bézier formula
-            t2 = t * t
-            t3 = t2 * t
-            mt = 1 - t
-            mt2 = mt * mt
-            mt3 = mt2 * mt
+        if (
+            previous_run is None
+            or previous_run["version"] != SPOTS_CACHE_VERSION
+            or previous_run["seed"] != seed
+            or previous_run["geometry"] != geometry_fingerprint
+        ):
+            return 0
 
-            point_x = mt3 * p0[0] + 3 * mt2 * t * p1[0] + 3 * mt * t2 * p2[0] + t3 * p3[0]
-            point_y = mt3 * p0[1] + 3 * mt2 * t * p1[1] + 3 * mt * t2 * p2[1] + t3 * p3[1]
-            points.append((point_x, point_y))
-        return points
+        previous_options = dict(previous_run["options"])
+        current_options = self.recorded_options(user_units_per_mm)
+        if previous_options.get("output_mode") != "separate" or current_options["output_mode"] != "separate":
+            return 0
+        previous_density = previous_options.pop("density", 0)
+        current_density = current_options.pop("density")
+        if previous_options != current_options:
+            return 0
+        return min(previous_density, current_density)
+
+    def worker_options(self) -> argparse.Namespace:
+        """Return a picklable copy of the options for worker processes.
+
+        Note:
+            Only plain values are copied; file handles set up by inkex for
+            input and output are left out.
+        """
+        return argparse.Namespace(**{
+            name: value
+            for name, value in vars(self.options).items()
+            if isinstance(value, (str, int, float, bool))
+        })
 
-    def point_in_path(
+    def prepare_shape_job(
         self,
-        test_x: float,
-        test_y: float,
-        path_element
-    ) -> bool:
-        """Test if point is inside the path using ray-casting algorithm.
+        selected_element,
+        seed: int,
+        user_units_per_mm: float,
+        cache: DiskCache | None
+    ) -> ShapeJob | None:
+        """Flatten a target shape, reusing a cached outline and grid when possible.
 
         Args:
-            test_x: X coordinate of point to test
-            test_y: Y coordinate of point to test
-            path_element: SVG path element to test against
+            selected_element: Target path, shape primitive, text or group
+            seed: Seed of the shape's random sequence
+            user_units_per_mm: Document user units per millimeter
+            cache: Geometry cache, or None when caching is disabled
 
         Returns:
-            True if point is inside path, False otherwise
+            ShapeJob ready to be sent to a worker process, or None if the
+            element has no usable outline
 
         Note:
-            Uses even-odd rule: casts horizontal ray and counts intersections.
-            Odd count = inside, even count = outside.
+            The outline is flattened in document coordinates through the
+            element's composed transform, and the bounding box is taken from
+            it. Geometry entries are keyed by a hash of the element's markup,
+            composed transform, cell size, grid type and flattening tolerance, so
+            tweaking spot parameters in live preview does not recompute the
+            grid (nor convert text again). Only exact coverage grids are
+            cached: sampled grids depend on the random sequence.
         """
-        # Get path as superpath for predictable format
-        path = path_element.path.to_superpath()
+        flatten_tolerance = self.options.flatten_tolerance * user_units_per_mm
+        if cache is None or self.options.coverage_mode != "exact":
+            flattened_path = self.flatten_element(selected_element, flatten_tolerance)
+            if flattened_path is None:
+                return None
+            return ShapeJob(flattened_path, flattened_path.bounding_box(), seed)
 
-        # Flatten path to line segments
-        line_segments = []
-        for subpath in path:
-            for point_index in range(len(subpath)):
-                # Each segment in superpath is ((x,y), (cp1_x, cp1_y), (cp2_x, cp2_y))
-                current_point = subpath[point_index]
-                next_point_index = (point_index + 1) % len(subpath)
+        geometry_key = cache_key(
+            "geometry", GEOMETRY_CACHE_VERSION,
+            selected_element.tostring().decode(), str(selected_element.composed_transform()),
+            self.options.grid_cell_size * user_units_per_mm,
+            flatten_tolerance, GRID_SCANLINES_PER_CELL,
+            self.options.adaptive_grid and QUADTREE_REFINE_LEVELS
+        )
+        cached_geometry = cache.get(geometry_key)
+        if cached_geometry is not None:
+            flattened_path = FlattenedPath.from_json(cached_geometry["outline"])
+            grid_type = CoverageQuadtree if self.options.adaptive_grid else CoverageGrid
+            return ShapeJob(
+                flattened_path, flattened_path.bounding_box(), seed,
+                coverage_grid=grid_type.from_json(cached_geometry["grid"])
+            )
 
-                # Close path - connect last to first
-                if next_point_index == 0 and point_index == len(subpath) - 1:
-                    next_point = subpath[0]
-                else:
-                    next_point = subpath[next_point_index]
+        flattened_path = self.flatten_element(selected_element, flatten_tolerance)
+        if flattened_path is None:
+            return None
+        return ShapeJob(
+            flattened_path, flattened_path.bounding_box(), seed,
+            geometry_key=geometry_key
+        )
 
-                # Extract Bézier control points
-                bezier_p0 = (current_point[1][0], current_point[1][1])  # current point
-                bezier_p1 = (current_point[2][0], current_point[2][1])  # control point 1
-                bezier_p2 = (next_point[0][0], next_point[0][1])  # control point 2
-                bezier_p3 = (next_point[1][0], next_point[1][1])  # next point
+    def flatten_element(self, element, tolerance: float | None = None) -> FlattenedPath | None:
+        """Flatten any supported element into an outline in document coordinates.
 
-                # Flatten Bézier curve to line segments
-                flattened_points = self.flatten_bezier(bezier_p0, bezier_p1, bezier_p2, bezier_p3)
-                for segment_index in range(len(flattened_points) - 1):
-                    line_segments.append((
-                        flattened_points[segment_index],
-                        flattened_points[segment_index + 1]
-                    ))
+        Args:
+            element: Path, shape primitive, text or group
+            tolerance: Flattening tolerance in user units
 
-        # Ray casting: count intersections with horizontal ray from point
-        intersection_count = 0
-        for segment_start, segment_end in line_segments:
-            start_x, start_y = segment_start
-            end_x, end_y = segment_end
+        Returns:
+            FlattenedPath, or None if the element has no closed outline:
+            lines, open paths along a straight line, zero-size shapes and
+            groups of only such elements enclose no area (see
+            FlattenedPath.encloses_area())
 
-            # Skip horizontal segments
-            if start_y == end_y:
-                continue
+        Note:
+            Groups become the union of their children (nested groups
+            included, spots groups generated by earlier runs left out),
+            text is replaced by its converted outlines.
+            Rectangles without rounded corners, circles and ellipses also
+            get an analytic_shape, so point tests skip the flattened edges.
+        """
+        if isinstance(element, TEXT_ELEMENT_TYPES):
+            element = self.text_outline(element)
+            if element is None:
+                return None
 
-            # Check if ray intersects segment's y range
-            if not (min(start_y, end_y) < test_y <= max(start_y, end_y)):
-                continue
+        if isinstance(element, inkex.Group):
+            outlines = []
+            for child in element:
+                if isinstance(child, OUTLINE_ELEMENT_TYPES) and child.get(SPOTS_SOURCE_ATTRIBUTE) is None:
+                    child_outline = self.flatten_element(child, tolerance)
+                    if child_outline is not None:
+                        outlines.append(child_outline)
+            if len(outlines) > 1:
+                return FlattenedPath.union(outlines)
+            return outlines[0] if outlines else None
 
-            # Calculate x coordinate of intersection
-            intersect_x = start_x + (test_y - start_y) * (end_x - start_x) / (end_y - start_y)
+        composed_transform = element.composed_transform()
+        flattened_path = self.flatten_path(element, tolerance, composed_transform)
+        if not flattened_path.edges or not flattened_path.encloses_area():
+            return None
+        flattened_path.analytic_shape = self.analytic_shape(element, composed_transform)
+        return flattened_path
 
-            # Count if intersection is to the right of test point
-            if intersect_x > test_x:
-                intersection_count += 1
+    def analytic_shape(self, element, composed_transform: inkex.Transform) -> tuple | None:
+        """Describe a rectangle, circle or ellipse for exact containment tests.
 
-        # Odd number of intersections = inside (even-odd rule)
-        return intersection_count % 2 == 1
+        Returns:
+            Value for FlattenedPath.analytic_shape, or None for other elements
+            (and rounded rectangles or non-invertible transforms)
+        """
+        if composed_transform.a * composed_transform.d - composed_transform.b * composed_transform.c == 0:
+            return None
+        inverse = -composed_transform
+        inverse_coefficients = (inverse.a, inverse.b, inverse.c, inverse.d, inverse.e, inverse.f)
 
-    def create_coverage_grid(
-        self,
-        bbox,
-        path_element,
-        cell_size_mm: float = GRID_CELL_SIZE_MM
-    ) -> tuple[list[list[int]], int, int, float, float]:
-        """Create coverage grid with fixed cell size.
+        if isinstance(element, inkex.Rectangle):
+            if element.rx or element.ry:
+                return None
+            return (
+                "rect", *inverse_coefficients,
+                element.left, element.top, element.left + element.width, element.top + element.height
+            )
+        if isinstance(element, (inkex.Circle, inkex.Ellipse)):
+            radius = element.radius
+            radius_x, radius_y = (radius, radius) if isinstance(radius, (int, float)) else (radius.x, radius.y)
+            if radius_x <= 0 or radius_y <= 0:
+                return None
+            return ("ellipse", *inverse_coefficients, element.center.x, element.center.y, radius_x, radius_y)
+        return None
+
+    def text_outline(self, text_element):
+        """Return the outlines of a text element, converting all target text once.
 
         Args:
-            bbox: Bounding box of the shape
-            path_element: SVG path element to test
-            cell_size_mm: Cell size in millimeters
+            text_element: Text element of the document
 
         Returns:
-            Tuple of (grid, grid_cols, grid_rows, cell_width, cell_height)
-            Grid values: 0=empty, 1=partial, 2=full
+            Path or group holding the text's outlines, in a converted copy of
+            the document with the same structure, or None if conversion failed
 
         Note:
-            Samples GRID_SAMPLES_PER_CELL points per cell to classify coverage.
-            Cells with >=90% coverage are marked as full.
+            Conversion runs Inkscape's Object to Path on every text of the
+            selection in a single command line call.
         """
-        bbox_x_min, bbox_y_min = bbox.left, bbox.top
-        bbox_width, bbox_height = bbox.width, bbox.height
+        if self.text_outlines is None:
+            self.text_outlines = {}
+            text_ids = [element.get_id() for element in self.text_targets]
+            try:
+                converted_svg = inkex.command.inkscape_command(
+                    self.svg, actions=f"select-by-id:{','.join(text_ids)};object-to-path"
+                )
+            except (inkex.command.CommandNotFound, inkex.command.ProgramRunError) as error:
+                inkex.errormsg(
+                    f"Could not convert text to outlines ({error}). "
+                    "Use Path > Object to Path on the text first."
+                )
+                return None
+            converted_document = inkex.load_svg(converted_svg).getroot()
+            for text_id in text_ids:
+                self.text_outlines[text_id] = converted_document.getElementById(text_id)
+        return self.text_outlines.get(text_element.get_id())
 
-        # Convert cell size to user units
-        cell_size = self.svg.unittouu(f"{cell_size_mm}mm")
+    def run_shape_jobs(
+        self,
+        shape_jobs: list[ShapeJob],
+        user_units_per_mm: float,
+        cache: DiskCache | None
+    ) -> list[list[tuple[str, str, int | None, int]]]:
+        """Generate the spots of every shape, in parallel when worthwhile.
 
-        # Calculate grid dimensions
-        grid_cols = max(1, int(bbox_width / cell_size))
-        grid_rows = max(1, int(bbox_height / cell_size))
+        Args:
+            shape_jobs: Shapes prepared by prepare_shape_job()
+            user_units_per_mm: Document user units per millimeter
+            cache: Result and geometry cache, or None when caching is disabled
 
-        # Actual cell dimensions
-        cell_width = bbox_width / grid_cols
-        cell_height = bbox_height / grid_rows
+        Returns:
+            Spot list per shape, in the same order as shape_jobs
 
-        # Initialize grid
-        grid = [[0 for _ in range(grid_cols)] for _ in range(grid_rows)]
+        Note:
+            With an explicit --seed, results are looked up in and stored to
+            the on-disk result cache, since they are then a pure function of
+            geometry, options and seed. Uncached shapes are computed in a
+            ProcessPoolExecutor with --workers processes (0 = one per CPU)
+            when more than one remains, falling back to running in-process
+            when a pool cannot be started. Statistics collected by each
+            shape are merged into self.stats.
+        """
+        options = self.worker_options()
+        shape_spots = [None] * len(shape_jobs)
 
-        # Sample each cell to determine coverage
-        samples_per_cell = GRID_SAMPLES_PER_CELL
-        for row_index in range(grid_rows):
-            for col_index in range(grid_cols):
-                # Cell bounds
-                cell_x_min = bbox_x_min + col_index * cell_width
-                cell_y_min = bbox_y_min + row_index * cell_height
+        # Look up previously computed results
+        result_cache = cache if self.options.seed else None
+        cache_keys = [None] * len(shape_jobs)
+        if result_cache is not None:
+            for job_index, shape_job in enumerate(shape_jobs):
+                cache_keys[job_index] = self.spots_cache_key(
+                    options, shape_job.flattened_path, shape_job.bbox, user_units_per_mm, shape_job.seed,
+                    shape_job.first_spot
+                )
+                shape_spots[job_index] = result_cache.get(cache_keys[job_index])
+            self.stats.count("spots_cache_hits", sum(1 for spots in shape_spots if spots is not None))
+        self.stats.count("geometry_cache_hits", sum(1 for shape_job in shape_jobs if shape_job.coverage_grid is not None))
 
-                # Sample points in cell
-                inside_count = 0
-                for sample_index in range(samples_per_cell):
-                    sample_x = cell_x_min + random.uniform(0, cell_width)
-                    sample_y = cell_y_min + random.uniform(0, cell_height)
+        pending_indices = [job_index for job_index, spots in enumerate(shape_spots) if spots is None]
+        pending_jobs = [shape_jobs[job_index] for job_index in pending_indices]
+        computed_results = None
 
-                    if self.point_in_path(sample_x, sample_y, path_element):
-                        inside_count += 1
+        worker_count = self.options.workers or os.cpu_count() or 1
+        worker_count = min(worker_count, len(pending_jobs))
+        if worker_count > 1:
+            try:
+                with concurrent.futures.ProcessPoolExecutor(max_workers=worker_count) as executor:
+                    futures = [
+                        executor.submit(generate_shape_spots, options, shape_job, user_units_per_mm, cache)
+                        for shape_job in pending_jobs
+                    ]
+                    computed_results = [future.result() for future in futures]
+            except (OSError, concurrent.futures.process.BrokenProcessPool):
+                pass  # No usable process pool: compute in-process below
 
-                # Classify cell
-                coverage = inside_count / samples_per_cell
-                if coverage == 0:
-                    grid[row_index][col_index] = 0  # empty
-                elif coverage >= FULL_CELL_COVERAGE_THRESHOLD:
-                    grid[row_index][col_index] = 2  # full
-                else:
-                    grid[row_index][col_index] = 1  # partial
+        if computed_results is None:
+            computed_results = [
+                generate_shape_spots(options, shape_job, user_units_per_mm, cache)
+                for shape_job in pending_jobs
+            ]
 
-        return grid, grid_cols, grid_rows, cell_width, cell_height
+        for job_index, (spots, shape_stats) in zip(pending_indices, computed_results):
+            self.stats.merge(shape_stats)
+            shape_spots[job_index] = spots
+            if result_cache is not None:
+                result_cache.put(cache_keys[job_index], spots)
 
-    def generate_valid_point(
+        return shape_spots
+
+    def iter_shape_spot_chunks(
         self,
-        bbox_x_min: float,
-        bbox_y_min: float,
-        grid: list[list[int]],
-        grid_cols: int,
-        grid_rows: int,
-        cell_width: float,
-        cell_height: float,
-        path_element,
-        max_retries: int = MAX_POINT_GENERATION_RETRIES
-    ) -> tuple[float | None, float | None]:
-        """Generate a point inside the shape using grid-guided sampling.
+        shape_job: ShapeJob,
+        user_units_per_mm: float,
+        cache: DiskCache | None
+    ):
+        """Generate the spots of one prepared shape lazily, a chunk at a time.
 
         Args:
-            bbox_x_min: Left boundary of bounding box
-            bbox_y_min: Top boundary of bounding box
-            grid: Coverage grid with cell classifications (0=empty, 1=partial, 2=full)
-            grid_cols: Number of grid columns
-            grid_rows: Number of grid rows
-            cell_width: Width of each grid cell
-            cell_height: Height of each grid cell
-            path_element: SVG path element to test points against
-            max_retries: Maximum number of attempts before giving up
+            shape_job: Shape prepared by prepare_shape_job()
+            user_units_per_mm: Document user units per millimeter
+            cache: Geometry cache receiving a newly computed grid, or None
 
         Returns:
-            Tuple of (x, y) coordinates if successful, (None, None) if failed
-
-        Note:
-            Full cells (2) are weighted 3x more heavily than partial cells (1).
-            Full cells skip the point-in-path test for efficiency.
+            Generator of spot lists, see iter_spot_chunks()
         """
-        # Build list of cells weighted by coverage
-        weighted_cells = []
-        for row_index in range(grid_rows):
-            for col_index in range(grid_cols):
-                if grid[row_index][col_index] == 2:  # full cell
-                    # Add multiple times for higher probability
-                    weighted_cells.extend([(row_index, col_index)] * 3)
-                elif grid[row_index][col_index] == 1:  # partial cell
-                    weighted_cells.append((row_index, col_index))
-
-        # Early return if no valid cells
-        if not weighted_cells:
-            return None, None
+        rng = random.Random(shape_job.seed)
 
-        for attempt_number in range(max_retries):
-            # Pick random cell from weighted list
-            cell_row, cell_col = random.choice(weighted_cells)
+        coverage_grid = shape_job.coverage_grid
+        if coverage_grid is None:
+            coverage_grid = self.create_coverage_grid(
+                shape_job.bbox, shape_job.flattened_path,
+                self.options.grid_cell_size * user_units_per_mm, rng,
+                coverage_mode=self.options.coverage_mode, adaptive=self.options.adaptive_grid
+            )
+            if cache is not None and shape_job.geometry_key is not None:
+                cache.put(shape_job.geometry_key, {
+                    "outline": shape_job.flattened_path.to_json(),
+                    "grid": coverage_grid.to_json()
+                })
 
-            # Generate random point within cell
-            point_x = bbox_x_min + cell_col * cell_width + random.uniform(0, cell_width)
-            point_y = bbox_y_min + cell_row * cell_height + random.uniform(0, cell_height)
+        return self.iter_spot_chunks(
+            shape_job.flattened_path, shape_job.bbox, user_units_per_mm, rng, coverage_grid,
+            first_spot=shape_job.first_spot
+        )
 
-            # Test if in path (skip test for full cells for efficiency)
-            if grid[cell_row][cell_col] == 2 or self.point_in_path(point_x, point_y, path_element):
-                return point_x, point_y
+    def spots_cache_key(
+        self,
+        options: argparse.Namespace,
+        flattened_path: FlattenedPath,
+        bbox,
+        user_units_per_mm: float,
+        seed: int,
+        first_spot: int = 0
+    ) -> str:
+        """Return the result cache key of one shape.
 
-        # Failed to find valid point after all retries
-        return None, None
+        Note:
+            Covers everything generate_spots() depends on: geometry, bounding
+            box, document units, spot-related options, the shape's seed and
+            the first spot generated.
+        """
+        return cache_key(
+            "spots", SPOTS_CACHE_VERSION, flattened_path.fingerprint(),
+            [bbox.left, bbox.top, bbox.width, bbox.height],
+            user_units_per_mm, spot_options(options), seed, first_spot
+        )
 
-    def effect(self) -> None:
-        """Main extension execution - generates weathered texture spots.
+    def generate_spots(
+        self,
+        flattened_path: FlattenedPath,
+        bbox,
+        user_units_per_mm: float,
+        rng: random.Random,
+        coverage_grid: CoverageGrid | None = None,
+        first_spot: int = 0
+    ) -> list[tuple[str, str, int | None, int]]:
+        """Generate the texture spots of one shape.
 
-        Processes the selected SVG path and generates texture spots within its boundaries
-        using shape-aware distribution with optional clustering and elongation.
+        Args:
+            flattened_path: Flattened outline of the shape
+            bbox: Bounding box of the shape
+            user_units_per_mm: Document user units per millimeter
+            rng: Random generator of the shape
+            coverage_grid: Precomputed coverage grid, created here if omitted
+            first_spot: Index of the first spot to generate; earlier spots
+                are skipped (see reusable_spot_count())
 
         Returns:
-            None
+            List of (path_data, spot_kind, cluster_index, spot_index) per
+            spot, where spot_kind is "organic" or "angular" and
+            cluster_index is None for uniformly placed spots. Spots that
+            could not be placed or were clipped away are left out.
 
         Note:
-            Creates a new group containing all generated spots as separate path elements.
-            Uses coverage grid for efficient shape-aware placement.
+            Collects every chunk of iter_spot_chunks().
         """
-        # Early return: Check if path is selected
-        if not self.svg.selected:
-            inkex.errormsg("Please select a path first")
-            return
+        return [
+            spot
+            for spot_chunk in self.iter_spot_chunks(
+                flattened_path, bbox, user_units_per_mm, rng, coverage_grid, first_spot
+            )
+            for spot in spot_chunk
+        ]
 
-        selected_element = list(self.svg.selected.values())[0]
+    def iter_spot_chunks(
+        self,
+        flattened_path: FlattenedPath,
+        bbox,
+        user_units_per_mm: float,
+        rng: random.Random,
+        coverage_grid: CoverageGrid | None = None,
+        first_spot: int = 0,
+        chunk_size: int = SPOT_CHUNK_SIZE
+    ):
+        """Generate the texture spots of one shape lazily, a chunk at a time.
 
-        # Early return: Check if bounding box can be calculated
-        bbox = selected_element.bounding_box()
-        if bbox is None:
-            inkex.errormsg("Could not get path bounding box")
-            return
+        Args:
+            flattened_path: Flattened outline of the shape
+            bbox: Bounding box of the shape
+            user_units_per_mm: Document user units per millimeter
+            rng: Random generator of the shape
+            coverage_grid: Precomputed coverage grid, created here if omitted
+            first_spot: Index of the first spot to generate
+            chunk_size: Number of spot indices handled per chunk
 
-        bbox_x_min, bbox_y_min = bbox.left, bbox.top
-        bbox_width, bbox_height = bbox.width, bbox.height
+        Yields:
+            Lists of spots as returned by generate_spots(), in spot index
+            order
 
+        Note:
+            Only reads self.options, never the document, so it can run in a
+            worker process. The result is a pure function of the geometry,
+            the options and the state of rng. Every spot draws from its own
+            generator, seeded from rng and the spot index, so spot i does
+            not depend on the number of spots: raising the density only
+            adds spots. Blue-noise placement is sequential, but stops at
+            the requested count without looking ahead, so its first spots
+            do not depend on the density either.
+            Clusters, samplers and the clipper are built once; placement,
+            spot shapes and path data are computed per chunk, so memory use
+            does not grow with the number of spots (blue-noise placement
+            keeps every point, as later points are spaced against them).
+            A density map is sampled once, at the size of the smallest
+            quadtree leaves, and folded into the cell and cluster weights;
+            full quadtree leaves are split down to that size first so the
+            map is followed everywhere.
+        """
         # Create coverage grid for shape-aware distribution
-        grid, grid_cols, grid_rows, cell_width, cell_height = self.create_coverage_grid(
-            bbox, selected_element
-        )
+        if coverage_grid is None:
+            coverage_grid = self.create_coverage_grid(
+                bbox, flattened_path, self.options.grid_cell_size * user_units_per_mm, rng,
+                coverage_mode=self.options.coverage_mode, adaptive=self.options.adaptive_grid
+            )
+
+        density_field = None
+        if self.options.density_map != "none":
+            with self.stats.timer("density_map"):
+                density_field = self.create_density_field(
+                    bbox, flattened_path, self.options.grid_cell_size * user_units_per_mm / 2 ** QUADTREE_REFINE_LEVELS,
+                    user_units_per_mm
+                )
+                if isinstance(coverage_grid, CoverageQuadtree):
+                    coverage_grid = coverage_grid.subdivided()
 
         # Convert spot size parameters from mm to user units
-        spot_size_min = self.svg.unittouu(f"{self.options.size_min}mm")
-        spot_size_max = self.svg.unittouu(f"{self.options.size_max}mm")
+        spot_size_min = self.options.size_min * user_units_per_mm
+        spot_size_max = self.options.size_max * user_units_per_mm
 
         # Extract and normalize parameters
         spot_density = self.options.density
         irregularity = self.options.irregularity / 100.0
         shape_type = self.options.shape_type
-        clustering_factor = self.options.clustering / 100.0
-        num_clusters = self.options.num_clusters
         elongation_base = self.options.elongation
         elongation_variation = self.options.elongation_variation / 100.0
         elongation_angle_base = math.radians(self.options.elongation_angle)
         angle_variation = self.options.angle_variation / 100.0
 
-        # Create group to contain all generated spots
-        spots_group = selected_element.getparent().add(inkex.Group())
-
-        # Generate cluster centers (only in non-empty cells)
-        clusters = []
-        non_empty_cells = []
-        for row_index in range(grid_rows):
-            for col_index in range(grid_cols):
-                if grid[row_index][col_index] > 0:  # partial or full cell
-                    non_empty_cells.append((row_index, col_index))
-
-        if non_empty_cells:
-            for cluster_index in range(num_clusters):
-                # Pick random non-empty cell for cluster center
-                cell_row, cell_col = random.choice(non_empty_cells)
+        # One generator per spot, keyed by the spot index
+        spot_seed = rng.getrandbits(64) << 32
 
-                # Place cluster center randomly within chosen cell
-                cluster_center_x = (
-                    bbox_x_min + cell_col * cell_width + random.uniform(0, cell_width)
-                )
-                cluster_center_y = (
-                    bbox_y_min + cell_row * cell_height + random.uniform(0, cell_height)
+        # Blue-noise placement draws sizes with the points and ignores clustering
+        with self.stats.timer("placement"):
+            if self.options.distribution == "poisson":
+                poisson_points = self.generate_poisson_points(
+                    spot_density, coverage_grid, flattened_path, (spot_size_min, spot_size_max),
+                    self.options.min_spacing * user_units_per_mm, self.options.spacing_by_size, rng,
+                    density_field=density_field
                 )
+            else:
+                clusters = self.create_clusters(coverage_grid, bbox, rng, density_field)
+                cluster_sampler = None
+                if clusters:
+                    cluster_sampler = self.create_cluster_sampler(
+                        clusters, coverage_grid, flattened_path, density_field
+                    )
+                cell_sampler = self.create_cell_sampler(coverage_grid, density_field)
 
-                # Calculate cluster radius (smaller at high clustering values for tighter groups)
-                cluster_radius = (
-                    min(bbox_width, bbox_height)
-                    * random.uniform(0.05, 0.15)
-                    * (1.5 - clustering_factor)
-                )
+        with self.stats.timer("spot_paths"):
+            clipper = None
+            if self.options.clip_to_shape:
+                clipper = OutlineClipper(flattened_path, coverage_grid)
+        curve_tolerance = self.options.flatten_tolerance * user_units_per_mm
+        self.stats.count("spots_requested", max(0, spot_density - first_spot))
 
-                # Assign random weight for cluster selection probability
-                cluster_weight = random.uniform(0.5, 2.0)
+        for chunk_start in range(first_spot, spot_density, chunk_size):
+            spot_indices = range(chunk_start, min(spot_density, chunk_start + chunk_size))
+            spot_rngs = [random.Random(spot_seed | spot_index) for spot_index in spot_indices]
 
-                clusters.append((cluster_center_x, cluster_center_y, cluster_radius, cluster_weight))
+            with self.stats.timer("placement"):
+                if self.options.distribution == "poisson":
+                    chunk_points = poisson_points[spot_indices.start:spot_indices.stop]
+                    spot_points = [(point_x, point_y, None) for point_x, point_y, spot_size in chunk_points]
+                    spot_points += [None] * (len(spot_rngs) - len(spot_points))
+                    spot_sizes = [spot_size for point_x, point_y, spot_size in chunk_points]
+                else:
+                    spot_points = self.generate_scattered_points(
+                        spot_rngs, coverage_grid, flattened_path, clusters, cluster_sampler, cell_sampler
+                    )
+                    spot_sizes = None
+            self.stats.count("spots_unplaced", spot_points.count(None))
 
-        # Generate individual spots
-        for spot_index in range(spot_density):
-            # Determine if this spot should use clustering (non-linear for stronger effect)
-            use_clustering = random.random() < (clustering_factor ** 0.5)
+            spot_specs = []
+            spot_clusters = []
+            spot_numbers = []
 
-            spot_x, spot_y = None, None
-            max_cluster_attempts = MAX_CLUSTER_POINT_ATTEMPTS
+            # Generate individual spots (points that could not be placed are skipped)
+            with self.stats.timer("spot_shapes"):
+                for spot_index, spot_point, spot_rng in zip(spot_indices, spot_points, spot_rngs):
+                    if spot_point is None:
+                        continue
+                    spot_x, spot_y, cluster_index = spot_point
 
-            # Try clustered distribution if enabled
-            if use_clustering and clusters:
-                for attempt_number in range(max_cluster_attempts):
-                    # Choose cluster with weighted probability
-                    cluster_weights = [cluster[3] for cluster in clusters]
-                    selected_cluster = random.choices(clusters, weights=cluster_weights)[0]
+                    # Generate random spot size (already drawn by blue-noise placement)
+                    if spot_sizes is not None:
+                        spot_size = spot_sizes[spot_index - chunk_start]
+                    else:
+                        spot_size = spot_rng.uniform(spot_size_min, spot_size_max)
 
-                    # Position within cluster using exponential distribution (more concentrated at center)
-                    distance_factor = random.expovariate(2.0)
-                    distance = min(selected_cluster[2] * distance_factor, selected_cluster[2])
-                    polar_angle = random.uniform(0, 2 * math.pi)
+                    # Calculate individual elongation with random variation
+                    spot_elongation = elongation_base * (
+                        1 + spot_rng.uniform(-elongation_variation, elongation_variation)
+                    )
+                    spot_elongation = max(1.0, spot_elongation)  # Minimum 1.0 (no negative elongation)
 
-                    test_x = selected_cluster[0] + distance * math.cos(polar_angle)
-                    test_y = selected_cluster[1] + distance * math.sin(polar_angle)
+                    # Calculate individual elongation angle with random variation
+                    angle_variation_radians = spot_rng.uniform(-angle_variation, angle_variation) * math.pi
+                    spot_elongation_angle = elongation_angle_base + angle_variation_radians
 
-                    # Clamp to bounding box
-                    test_x = max(bbox_x_min, min(bbox_x_min + bbox_width, test_x))
-                    test_y = max(bbox_y_min, min(bbox_y_min + bbox_height, test_y))
+                    # Choose shape based on type selection and draw its outline parameters
+                    if shape_type == "organic" or (shape_type == "mixed" and spot_rng.random() > 0.5):
+                        spot_kind = "organic"
+                    else:
+                        spot_kind = "angular"
+                    radius_variations, angle_jitters = self.draw_spot_shape(spot_kind, irregularity, spot_rng)
 
-                    # Check if point is inside shape
-                    if self.point_in_path(test_x, test_y, selected_element):
-                        spot_x, spot_y = test_x, test_y
-                        break
+                    spot_specs.append((
+                        spot_kind, spot_x, spot_y, spot_size, spot_elongation, spot_elongation_angle,
+                        radius_variations, angle_jitters
+                    ))
+                    spot_clusters.append(cluster_index)
+                    spot_numbers.append(spot_index)
 
-            # Fallback to uniform distribution if clustering failed or not using clustering
-            if spot_x is None:
-                spot_x, spot_y = self.generate_valid_point(
-                    bbox_x_min, bbox_y_min, grid, grid_cols, grid_rows,
-                    cell_width, cell_height, selected_element
+            # Build every spot outline of the chunk in one batch, clipping spots that overhang the outline
+            with self.stats.timer("spot_paths"):
+                path_data = self.build_spot_paths(
+                    spot_specs, self.options.path_precision, clipper, curve_tolerance,
+                    compact=self.options.compact_paths
                 )
+            self.stats.count("spots_clipped_away", path_data.count(None))
+            yield [
+                (spot_path_data, spot_spec[0], cluster_index, spot_index)
+                for spot_path_data, spot_spec, cluster_index, spot_index
+                in zip(path_data, spot_specs, spot_clusters, spot_numbers)
+                if spot_path_data is not None
+            ]
 
-            # Skip this spot if no valid position found
-            if spot_x is None or spot_y is None:
-                continue
+    def write_spots(
+        self,
+        spots_group,
+        spots: list[tuple[str, str, int | None, int]],
+        first_spot: int = 0
+    ) -> None:
+        """Write the generated spots into a spots group.
 
-            # Generate random spot size
-            spot_size = random.uniform(spot_size_min, spot_size_max)
+        Args:
+            spots_group: New group, or spots group of an earlier run
+            spots: Spots returned by generate_spots(), in document coordinates
+            first_spot: Index of the first generated spot; spots of an
+                earlier run below it are kept, all others are replaced
 
-            # Calculate individual elongation with random variation
-            spot_elongation = elongation_base * (
-                1 + random.uniform(-elongation_variation, elongation_variation)
-            )
-            spot_elongation = max(1.0, spot_elongation)  # Minimum 1.0 (no negative elongation)
+        Note:
+            With a merged output mode, spots are written as one compound path
+            per output bucket instead of one path per spot.
+        """
+        self.prepare_spots_group(spots_group, first_spot)
+        spot_sink = DocumentSpotSink(spots_group, self.options.output_mode)
+        spot_sink.add(spots)
+        spot_sink.close()
 
-            # Calculate individual elongation angle with random variation
-            angle_variation_radians = random.uniform(-angle_variation, angle_variation) * math.pi
-            spot_elongation_angle = elongation_angle_base + angle_variation_radians
+    def prepare_spots_group(self, spots_group, first_spot: int = 0) -> None:
+        """Set up a spots group and drop the spots about to be replaced.
 
-            # Generate shape based on type selection
-            if shape_type == "organic" or (shape_type == "mixed" and random.random() > 0.5):
-                path_data = self.generate_organic_blob(
-                    spot_x, spot_y, spot_size, irregularity, spot_elongation, spot_elongation_angle
-                )
-            else:
-                path_data = self.generate_angular_fragment(
-                    spot_x, spot_y, spot_size, irregularity, spot_elongation, spot_elongation_angle
-                )
+        Args:
+            spots_group: New group, or spots group of an earlier run
+            first_spot: Index of the first generated spot; spots of an
+                earlier run below it are kept
 
-            # Create SVG path element for this spot
-            spot_path_element = spots_group.add(inkex.PathElement())
-            spot_path_element.style = {
-                'fill': '#000000',
-                'fill-opacity': '1',
-                'stroke': 'none'
-            }
-            spot_path_element.path = path_data
-    
-    def generate_organic_blob(
+        Note:
+            The group carries the inverse of its parent's composed transform,
+            so spots land where they were computed whatever transformed groups
+            the parent sits in. The style is set once on the group and
+            inherited by every spot.
+        """
+        output_mode = self.options.output_mode
+
+        spots_group.style = SPOT_STYLE
+        spots_group.transform = -spots_group.getparent().composed_transform()
+
+        # Drop the spots being replaced (everything, unless spots are kept)
+        for child in list(spots_group):
+            spot_index = child.get(SPOT_INDEX_ATTRIBUTE)
+            if (
+                output_mode != "separate" or spot_index is None
+                or not spot_index.isdigit() or int(spot_index) >= first_spot
+            ):
+                spots_group.remove(child)
+
+    def draw_spot_shape(
         self,
-        center_x: float,
-        center_y: float,
-        size: float,
+        spot_kind: str,
         irregularity: float,
-        elongation: float,
-        elongation_angle: float
-    ) -> str:
-        """Generate organic blob shape with elongation.
+        rng: random.Random
+    ) -> tuple[list[float], list[float] | None]:
+        """Draw the random outline parameters of one spot.
 
         Args:
-            center_x: X coordinate of blob center
-            center_y: Y coordinate of blob center
-            size: Diameter of blob
+            spot_kind: "organic" or "angular"
             irregularity: Amount of border variation (0-1)
-            elongation: Elongation factor along axis
-            elongation_angle: Angle of elongation axis in radians
+            rng: Random generator for point count and variations
 
         Returns:
-            SVG path data string for the organic blob
+            Tuple of (radius_variations, angle_jitters); one entry per outline
+            point, angle_jitters is None for organic blobs
 
         Note:
-            Uses 6-12 random points with normalized irregularity to maintain
-            consistent average size. Creates smooth curves with Bézier control points.
+            Organic blobs use 6-12 points, angular fragments 3-8 points with
+            1.5x irregularity and up to 0.3 rad of angle jitter. Variations are
+            normalized so the average radius stays constant.
         """
-        num_points = random.randint(6, 12)
-        blob_points = []
+        if spot_kind == "organic":
+            num_points = rng.randint(6, 12)
+            variation_range = irregularity
+        else:
+            num_points = rng.randint(3, 8)
+            variation_range = irregularity * 1.5
 
-        # Pre-calculate irregularity variations (normalized to keep average radius constant)
+        # Pre-calculate irregularity variations
         radius_variations = []
         for point_index in range(num_points):
-            variation = 1 + random.uniform(-irregularity, irregularity)
+            variation = 1 + rng.uniform(-variation_range, variation_range)
             radius_variations.append(variation)
 
         # Normalize to keep average = 1.0
         avg_variation = sum(radius_variations) / len(radius_variations)
         radius_variations = [v / avg_variation for v in radius_variations]
 
-        # Generate points around circle with elongation
-        for point_index in range(num_points):
-            point_angle = (point_index / num_points) * 2 * math.pi
-            radius = (size / 2) * radius_variations[point_index]
+        # Angular jitter for a more chaotic look
+        angle_jitters = None
+        if spot_kind == "angular":
+            angle_jitters = [rng.uniform(-0.3, 0.3) for point_index in range(num_points)]
 
-            # Apply elongation transformation
-            cos_angle = math.cos(point_angle - elongation_angle)
-            sin_angle = math.sin(point_angle - elongation_angle)
+        return radius_variations, angle_jitters
 
-            # Elongate along the specified axis
-            stretched_x = cos_angle * elongation
-            stretched_y = sin_angle
+    def build_spot_paths(
+        self,
+        spot_specs: list[tuple],
+        precision: int = SPOT_COORDINATE_PRECISION,
+        clipper: OutlineClipper | None = None,
+        curve_tolerance: float | None = None,
+        compact: bool = False
+    ) -> list[str | None]:
+        """Build the path data of many spots at once.
 
-            # Rotate back to original orientation
-            final_x = stretched_x * math.cos(elongation_angle) - stretched_y * math.sin(elongation_angle)
-            final_y = stretched_x * math.sin(elongation_angle) + stretched_y * math.cos(elongation_angle)
+        Args:
+            spot_specs: List of (spot_kind, center_x, center_y, size, elongation,
+                elongation_angle, radius_variations, angle_jitters) tuples, with
+                the last two as returned by draw_spot_shape()
+            precision: Number of decimals written per coordinate
+            clipper: Clip spots overhanging the shape outline with this clipper
+            curve_tolerance: Flattening tolerance in user units for organic
+                blobs that get clipped
+            compact: Write compact path data (see CompactPathWriter)
 
-            point_x = center_x + radius * final_x
-            point_y = center_y + radius * final_y
-            blob_points.append((point_x, point_y))
+        Returns:
+            SVG path data string per spot, in the same order as spot_specs;
+            None for spots clipped away entirely
 
-        # Create smooth path with Bézier curves
-        path = f"M {blob_points[0][0]},{blob_points[0][1]} "
+        Note:
+            Vertices of all spots are computed together (array math with
+            NumPy, plain loops otherwise); the elongation rotation is computed
+            once per spot rather than once per vertex. Organic blobs become
+            smooth closed Bézier curves, angular fragments closed polygons.
+            Each spot is serialized with a single format operation. With a
+            clipper, spots whose control polygon the outline does not cross
+            are kept as they are (or dropped, if outside); only the others
+            are flattened and clipped into polygons.
+        """
+        if not spot_specs:
+            return []
 
-        for point_index in range(len(blob_points)):
-            next_point_index = (point_index + 1) % len(blob_points)
-            prev_point_index = (point_index - 1) % len(blob_points)
+        if np is not None:
+            vertex_rows = self.spot_vertex_rows_vectorized(spot_specs)
+        else:
+            vertex_rows = self.spot_vertex_rows(spot_specs)
 
-            # Calculate Bézier control points for smooth curves
-            control_point_1_x = blob_points[point_index][0] + (blob_points[next_point_index][0] - blob_points[prev_point_index][0]) * 0.25
-            control_point_1_y = blob_points[point_index][1] + (blob_points[next_point_index][1] - blob_points[prev_point_index][1]) * 0.25
-            control_point_2_x = blob_points[next_point_index][0] - (blob_points[next_point_index][0] - blob_points[point_index][0]) * 0.25
-            control_point_2_y = blob_points[next_point_index][1] - (blob_points[next_point_index][1] - blob_points[point_index][1]) * 0.25
+        # One format string per (kind, point count), applied to a flat row of values
+        coordinate_format = f"%.{precision}f,%.{precision}f"
+        path_formats = {}
+        path_data = []
+        path_writer = CompactPathWriter(precision) if compact else None
+        compact_batches = {}
+        for spot_spec, spot_values in zip(spot_specs, vertex_rows):
+            spot_kind, num_points = spot_spec[0], len(spot_spec[6])
+            if clipper is not None:
+                spot_xs = spot_values[0::2]
+                spot_ys = spot_values[1::2]
+                spot_location = clipper.locate(
+                    (min(spot_xs), min(spot_ys), max(spot_xs), max(spot_ys)), spot_values[0], spot_values[1]
+                )
+                if spot_location == 0:
+                    path_data.append(None)
+                    continue
+                if spot_location == 1:
+                    self.stats.count("spots_clipped")
+                    path_data.append(self.clip_spot(
+                        spot_kind, spot_values, clipper, curve_tolerance, precision, path_writer
+                    ))
+                    continue
+            if path_writer is not None:
+                # Written below, one batch per (kind, point count)
+                compact_batches.setdefault((spot_kind, num_points), []).append(len(path_data))
+                path_data.append(spot_values)
+                continue
+            path_format = path_formats.get((spot_kind, num_points))
+            if path_format is None:
+                if spot_kind == "organic":
+                    segment_format = f"C {coordinate_format} {coordinate_format} {coordinate_format} "
+                    path_format = f"M {coordinate_format} " + segment_format * num_points + "Z"
+                else:
+                    path_format = f"M {coordinate_format} " + f"L {coordinate_format} " * (num_points - 1) + "Z"
+                path_formats[(spot_kind, num_points)] = path_format
+            path_data.append(path_format % tuple(spot_values))
 
-            path += f"C {control_point_1_x},{control_point_1_y} {control_point_2_x},{control_point_2_y} {blob_points[next_point_index][0]},{blob_points[next_point_index][1]} "
+        for (spot_kind, num_points), spot_indices in compact_batches.items():
+            batch_path_data = path_writer.subpaths(
+                [path_data[spot_index] for spot_index in spot_indices],
+                *((6, "c") if spot_kind == "organic" else (2, "l"))
+            )
+            for spot_index, spot_path_data in zip(spot_indices, batch_path_data):
+                path_data[spot_index] = spot_path_data
+        return path_data
 
-        path += "Z"
-        return path
-    
-    def generate_angular_fragment(
+    def clip_spot(
         self,
-        center_x: float,
-        center_y: float,
-        size: float,
-        irregularity: float,
-        elongation: float,
-        elongation_angle: float
-    ) -> str:
-        """Generate angular fragment shape with elongation.
+        spot_kind: str,
+        spot_values: list[float],
+        clipper: OutlineClipper,
+        curve_tolerance: float | None,
+        precision: int = SPOT_COORDINATE_PRECISION,
+        path_writer: CompactPathWriter | None = None
+    ) -> str | None:
+        """Clip one spot against the shape outline.
 
         Args:
-            center_x: X coordinate of fragment center
-            center_y: Y coordinate of fragment center
-            size: Diameter of fragment
-            irregularity: Amount of border variation (0-1), amplified by 1.5x
-            elongation: Elongation factor along axis
-            elongation_angle: Angle of elongation axis in radians
+            spot_kind: "organic" or "angular"
+            spot_values: Flat coordinate list of the spot (see spot_vertex_rows())
+            clipper: Clipper of the shape outline
+            curve_tolerance: Flattening tolerance for organic blobs, in user units
+            precision: Number of decimals written per coordinate
+            path_writer: Writer of compact path data, or None for plain
+                absolute coordinates
 
         Returns:
-            SVG path data string for the angular fragment
+            Path data of the clipped polygon rings, or None if nothing is left
+        """
+        if spot_kind == "organic":
+            spot_polygon = [(spot_values[0], spot_values[1])]
+            for value_index in range(2, len(spot_values), 6):
+                curve = spot_values[value_index:value_index + 6]
+                spot_polygon.extend(self.flatten_bezier(
+                    spot_polygon[-1], (curve[0], curve[1]), (curve[2], curve[3]), (curve[4], curve[5]),
+                    tolerance=curve_tolerance
+                )[1:])
+            spot_polygon.pop()  # back at the start point
+        else:
+            spot_polygon = list(zip(spot_values[0::2], spot_values[1::2]))
 
-        Note:
-            Uses 3-8 random points with enhanced irregularity (1.5x) and angle jitter
-            to create sharp, crystalline shapes. Connects points with straight lines.
+        clipped_rings = clipper.clip(spot_polygon)
+        if not clipped_rings:
+            return None
+        if path_writer is not None:
+            return " ".join(
+                path_writer.subpaths([[value for point in ring for value in point]], 2, "l")[0]
+                for ring in clipped_rings
+            )
+        coordinate_format = f"%.{precision}f,%.{precision}f"
+        return " ".join(
+            "M " + " L ".join(coordinate_format % point for point in ring) + " Z"
+            for ring in clipped_rings
+        )
+
+    def spot_vertex_rows(self, spot_specs: list[tuple]) -> list[list[float]]:
+        """Compute the flat coordinate list of every spot with plain Python.
+
+        Returns:
+            Per spot: start point followed by (cp1, cp2, end) per curve for
+            organic blobs, or the polygon points for angular fragments
         """
-        num_points = random.randint(3, 8)
+        vertex_rows = []
+        for (
+            spot_kind, center_x, center_y, size, elongation, elongation_angle,
+            radius_variations, angle_jitters
+        ) in spot_specs:
+            num_points = len(radius_variations)
+            cos_elongation = math.cos(elongation_angle)
+            sin_elongation = math.sin(elongation_angle)
 
-        # Pre-calculate irregularity variations (normalized, enhanced for angular look)
-        radius_variations = []
-        for point_index in range(num_points):
-            variation = 1 + random.uniform(-irregularity * 1.5, irregularity * 1.5)
-            radius_variations.append(variation)
+            # Generate points around circle with elongation
+            spot_points = []
+            for point_index in range(num_points):
+                point_angle = (point_index / num_points) * 2 * math.pi
+                if angle_jitters is not None:
+                    point_angle += angle_jitters[point_index]
+                radius = (size / 2) * radius_variations[point_index]
 
-        # Normalize to keep average = 1.0
-        avg_variation = sum(radius_variations) / len(radius_variations)
-        radius_variations = [v / avg_variation for v in radius_variations]
+                # Elongate along the specified axis, then rotate back
+                stretched_x = math.cos(point_angle - elongation_angle) * elongation
+                stretched_y = math.sin(point_angle - elongation_angle)
+                final_x = stretched_x * cos_elongation - stretched_y * sin_elongation
+                final_y = stretched_x * sin_elongation + stretched_y * cos_elongation
 
-        # Generate angular points with jitter
-        fragment_points = []
-        for point_index in range(num_points):
-            # Add angular jitter for more chaotic look
-            point_angle = (point_index / num_points) * 2 * math.pi + random.uniform(-0.3, 0.3)
-            radius = (size / 2) * radius_variations[point_index]
+                spot_points.append((center_x + radius * final_x, center_y + radius * final_y))
+
+            spot_values = [spot_points[0][0], spot_points[0][1]]
+            if spot_kind != "organic":
+                for point_x, point_y in spot_points[1:]:
+                    spot_values += (point_x, point_y)
+                vertex_rows.append(spot_values)
+                continue
+
+            # Bézier control points for smooth curves
+            for point_index in range(num_points):
+                current_x, current_y = spot_points[point_index]
+                next_x, next_y = spot_points[(point_index + 1) % num_points]
+                prev_x, prev_y = spot_points[(point_index - 1) % num_points]
+                spot_values += (
+                    current_x + (next_x - prev_x) * 0.25,
+                    current_y + (next_y - prev_y) * 0.25,
+                    next_x - (next_x - current_x) * 0.25,
+                    next_y - (next_y - current_y) * 0.25,
+                    next_x,
+                    next_y
+                )
+            vertex_rows.append(spot_values)
+        return vertex_rows
+
+    def spot_vertex_rows_vectorized(self, spot_specs: list[tuple]) -> list[list[float]]:
+        """Compute the flat coordinate list of every spot with NumPy.
+
+        Returns:
+            Same layout as spot_vertex_rows(); values match it up to
+            last-digit rounding differences of the trigonometric functions
+        """
+        (
+            spot_kinds, centers_x, centers_y, sizes, elongations, elongation_angles,
+            all_radius_variations, all_angle_jitters
+        ) = zip(*spot_specs)
+        spot_count = len(spot_specs)
+        point_counts = np.array([len(radius_variations) for radius_variations in all_radius_variations])
+        total_points = int(point_counts.sum())
+
+        # Per-vertex owner spot and index within the spot
+        owner = np.repeat(np.arange(spot_count), point_counts)
+        first_points = np.cumsum(point_counts) - point_counts
+        point_indices = np.arange(total_points) - first_points[owner]
+        owner_counts = point_counts[owner]
+
+        centers_x = np.array(centers_x)[owner]
+        centers_y = np.array(centers_y)[owner]
+        half_sizes = (np.array(sizes) / 2)[owner]
+        elongations = np.array(elongations)[owner]
+        elongation_angles = np.array(elongation_angles)
+        cos_elongation = np.cos(elongation_angles)[owner]
+        sin_elongation = np.sin(elongation_angles)[owner]
+        elongation_angles = elongation_angles[owner]
+
+        radius_variations = np.fromiter(
+            itertools.chain.from_iterable(all_radius_variations), dtype=float, count=total_points
+        )
+        angle_jitters = np.fromiter(
+            itertools.chain.from_iterable(
+                angle_jitters if angle_jitters is not None else itertools.repeat(0.0, len(radius_variations))
+                for radius_variations, angle_jitters in zip(all_radius_variations, all_angle_jitters)
+            ),
+            dtype=float, count=total_points
+        )
+
+        # Points around circle with elongation
+        point_angles = (point_indices / owner_counts) * 2 * math.pi + angle_jitters
+        radii = half_sizes * radius_variations
+        stretched_x = np.cos(point_angles - elongation_angles) * elongations
+        stretched_y = np.sin(point_angles - elongation_angles)
+        points_x = centers_x + radii * (stretched_x * cos_elongation - stretched_y * sin_elongation)
+        points_y = centers_y + radii * (stretched_x * sin_elongation + stretched_y * cos_elongation)
+
+        # Neighbours within each spot's closed outline
+        next_points = first_points[owner] + (point_indices + 1) % owner_counts
+        prev_points = first_points[owner] + (point_indices - 1) % owner_counts
+        next_x, next_y = points_x[next_points], points_y[next_points]
+        source_values = np.concatenate((
+            np.column_stack((points_x, points_y)).ravel(),
+            np.column_stack((
+                points_x + (next_x - points_x[prev_points]) * 0.25,
+                points_y + (next_y - points_y[prev_points]) * 0.25,
+                next_x - (next_x - points_x) * 0.25,
+                next_y - (next_y - points_y) * 0.25,
+                next_x,
+                next_y
+            )).ravel()
+        ))
+
+        # Gather every spot's values in output order: the start point, then
+        # the curves (organic) or the remaining points (angular)
+        is_organic = np.array([spot_kind == "organic" for spot_kind in spot_kinds])
+        row_lengths = np.where(is_organic, 2 + 6 * point_counts, 2 * point_counts)
+        row_starts = np.cumsum(row_lengths) - row_lengths
+        row_owner = np.repeat(np.arange(spot_count), row_lengths)
+        row_offsets = np.arange(int(row_lengths.sum())) - row_starts[row_owner]
+        row_first_points = first_points[row_owner]
+        source_indices = np.where(
+            is_organic[row_owner] & (row_offsets >= 2),
+            2 * total_points + 6 * row_first_points + row_offsets - 2,
+            2 * row_first_points + row_offsets
+        )
+        flat_values = source_values[source_indices].tolist()
+
+        vertex_rows = []
+        for row_start, row_length in zip(row_starts.tolist(), row_lengths.tolist()):
+            vertex_rows.append(flat_values[row_start:row_start + row_length])
+        return vertex_rows
+
+
+def generate_shape_spots(
+    options: argparse.Namespace,
+    shape_job: ShapeJob,
+    user_units_per_mm: float,
+    cache: DiskCache | None
+) -> tuple[list[tuple[str, str, int | None, int]], dict]:
+    """Generate the spots of one shape; entry point of worker processes.
+
+    Args:
+        options: Picklable extension options (see Timeworn.worker_options)
+        shape_job: Shape prepared by Timeworn.prepare_shape_job()
+        user_units_per_mm: Document user units per millimeter
+        cache: Geometry cache receiving newly computed grids, or None
 
-            # Apply elongation transformation
-            cos_angle = math.cos(point_angle - elongation_angle)
-            sin_angle = math.sin(point_angle - elongation_angle)
+    Returns:
+        Tuple of (spots, statistics): the spots as returned by
+        Timeworn.generate_spots(), one (path_data, spot_kind,
+        cluster_index, spot_index) tuple per spot, and the statistics
+        as returned by RunStats.to_json()
+    """
+    extension = Timeworn()
+    extension.options = options
+    extension.stats = RunStats(enabled=instrumentation_requested(options))
+    spots = [
+        spot
+        for spot_chunk in extension.iter_shape_spot_chunks(shape_job, user_units_per_mm, cache)
+        for spot in spot_chunk
+    ]
+    return spots, extension.stats.to_json()
 
-            stretched_x = cos_angle * elongation
-            stretched_y = sin_angle
 
-            final_x = stretched_x * math.cos(elongation_angle) - stretched_y * math.sin(elongation_angle)
-            final_y = stretched_x * math.sin(elongation_angle) + stretched_y * math.cos(elongation_angle)
+def spot_options(options: argparse.Namespace) -> dict:
+    """Return the options the generated spots depend on."""
+    return {name: value for name, value in vars(options).items() if name not in NON_SPOT_OPTIONS}
 
-            point_x = center_x + radius * final_x
-            point_y = center_y + radius * final_y
-            fragment_points.append((point_x, point_y))
 
-        # Create path with straight lines (angular, not curved)
-        path = f"M {fragment_points[0][0]},{fragment_points[0][1]} "
-        for point_index in range(1, len(fragment_points)):
-            path += f"L {fragment_points[point_index][0]},{fragment_points[point_index][1]} "
-        path += "Z"
+def shape_seed(base_seed: int, shape_index: int) -> int:
+    """Derive the seed of one selected shape from the run's base seed."""
+    return random.Random(f"{base_seed}:{shape_index}").getrandbits(64)
 
-        return path
 
 if __name__ == '__main__':
     Timeworn().run()
\ No newline at end of file
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Weather many SVG files headlessly with the Timeworn extension.
+
+Runs the same Timeworn effect Inkscape runs, without Inkscape, on every
+SVG matched by the given files, directories or glob patterns. Accepts
+every option of the extension (--density, --size_min, ...) plus options
+selecting the target paths and controlling output.
+
+Example:
+    python3 timeworn_batch.py assets/ --select-class weather \\
+        --output-dir build/ --jobs 8 --density 800
+"""
+import argparse
+import concurrent.futures
+import glob
+import os
+import shutil
+import sys
+import time
+
+from timeworn import Timeworn
+
+
+class BatchTimeworn(Timeworn):
+    """Timeworn effect whose targets are chosen by id, class or XPath."""
+
+    def __init__(self, select_ids: list[str], select_classes: list[str], select_xpath: str | None):
+        super().__init__()
+        self.select_ids = select_ids
+        self.select_classes = select_classes
+        self.select_xpath = select_xpath
+        self.target_count = 0
+
+    def effect(self) -> None:
+        """Select the target elements, then run the regular effect."""
+        targets = []
+        for element_id in self.select_ids:
+            element = self.svg.getElementById(element_id)
+            if element is not None:
+                targets.append(element)
+        for class_name in self.select_classes:
+            targets.extend(
+                self.svg.xpath(f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]")
+            )
+        if self.select_xpath:
+            targets.extend(self.svg.xpath(self.select_xpath))
+
+        # Selection works by id; get_id() assigns one to elements lacking it
+        self.svg.selection.set(*[element.get_id() for element in targets])
+        self.target_count = len(self.svg.selection)
+        if self.target_count:
+            super().effect()
+
+
+class OptionRecorder:
+    """Forwards add_argument() calls and remembers the option destinations."""
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.destinations = []
+
+    def add_argument(self, *args, **kwargs):
+        action = self.parser.add_argument(*args, **kwargs)
+        self.destinations.append(action.dest)
+        return action
+
+
+def find_svg_files(inputs: list[str]) -> list[tuple[str, str]]:
+    """Expand files, directories and glob patterns into a sorted list of SVG files.
+
+    Args:
+        inputs: File paths, directories (all *.svg inside) or glob patterns
+
+    Returns:
+        Sorted list of unique (SVG file path, path relative to its input
+        root) pairs. The root of a directory is the directory itself, the
+        root of a glob pattern is its leading part without wildcards and a
+        file is its own root, so its relative path is its name.
+    """
+    svg_files = {}
+    for input_path in inputs:
+        if os.path.isdir(input_path):
+            matches, input_root = glob.glob(os.path.join(input_path, "*.svg")), input_path
+        elif os.path.isfile(input_path):
+            matches, input_root = [input_path], os.path.dirname(input_path)
+        else:
+            matches, input_root = glob.glob(input_path, recursive=True), glob_root(input_path)
+        for svg_file in matches:
+            svg_files.setdefault(svg_file, os.path.relpath(svg_file, input_root or os.curdir))
+    return sorted(svg_files.items())
+
+
+def glob_root(pattern: str) -> str:
+    """Return the leading directories of a glob pattern that contain no wildcard."""
+    root_parts = []
+    for part in os.path.dirname(pattern).split(os.sep):
+        if glob.has_magic(part):
+            break
+        root_parts.append(part)
+    return os.sep.join(root_parts)
+
+
+def weather_file(
+    input_path: str,
+    output_path: str,
+    effect_args: list[str],
+    select_ids: list[str],
+    select_classes: list[str],
+    select_xpath: str | None
+) -> tuple[str, int, float, str | None]:
+    """Run the Timeworn effect on one file; entry point of worker processes.
+
+    Args:
+        input_path: SVG file to read
+        output_path: SVG file to write
+        effect_args: Extension options as command-line arguments
+        select_ids: Ids of target elements
+        select_classes: Classes of target elements
+        select_xpath: XPath expression selecting target elements
+
+    Returns:
+        Tuple of (input_path, target_count, seconds, error message or None)
+
+    Note:
+        A file without targets is copied to output_path unchanged, so the
+        output directory always holds every input.
+    """
+    start_time = time.perf_counter()
+    extension = BatchTimeworn(select_ids, select_classes, select_xpath)
+    try:
+        extension.run(args=effect_args + [f"--output={output_path}", input_path])
+        if extension.target_count == 0:
+            shutil.copyfile(input_path, output_path)
+    except (Exception, SystemExit) as error:
+        return input_path, extension.target_count, time.perf_counter() - start_time, str(error) or repr(error)
+    return input_path, extension.target_count, time.perf_counter() - start_time, None
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Weather many SVG files with the Timeworn effect, without Inkscape."
+    )
+    parser.add_argument("inputs", nargs="+", help="SVG files, directories or glob patterns")
+    parser.add_argument("--output-dir", required=True, help="Directory receiving the weathered files")
+    parser.add_argument("--suffix", default="", help="Suffix added to output file names (before .svg)")
+    parser.add_argument("--select-id", action="append", default=[], help="Id of a target path (repeatable)")
+    parser.add_argument("--select-class", action="append", default=[], help="Class of target paths (repeatable)")
+    parser.add_argument("--select-xpath", help="XPath expression selecting target paths, e.g. //svg:path")
+    parser.add_argument("--jobs", type=int, default=0, help="Files processed in parallel (0 = one per CPU)")
+
+    # Every option of the extension itself, forwarded unchanged
+    effect_options = OptionRecorder(parser.add_argument_group("effect options"))
+    Timeworn().add_arguments(effect_options)
+
+    # Tell an explicit --workers apart from the extension's default
+    default_workers = parser.get_default("workers")
+    parser.set_defaults(workers=None)
+
+    args = parser.parse_args(argv)
+    if not (args.select_id or args.select_class or args.select_xpath):
+        parser.error("select target paths with --select-id, --select-class or --select-xpath")
+    for class_name in args.select_class:
+        # The class is matched inside an XPath string literal
+        if class_name.split() != [class_name] or "'" in class_name or '"' in class_name:
+            parser.error(f"--select-class takes a single class name without spaces or quotes: {class_name!r}")
+
+    svg_files = find_svg_files(args.inputs)
+    if not svg_files:
+        parser.error("no SVG files found")
+
+    job_count = args.jobs or os.cpu_count() or 1
+    job_count = min(job_count, len(svg_files))
+
+    # Files are the unit of parallelism; unless --workers is given, do not
+    # nest a shape pool inside each file
+    if args.workers is None:
+        args.workers = 1 if job_count > 1 else default_workers
+    effect_args = [f"--{destination}={getattr(args, destination)}" for destination in effect_options.destinations]
+
+    # Outputs mirror each input's path below its input root; never overwrite an input or another output
+    file_jobs = []
+    output_sources = {}
+    for input_path, relative_path in svg_files:
+        base_name, extension = os.path.splitext(relative_path)
+        output_path = os.path.join(args.output_dir, f"{base_name}{args.suffix}{extension}")
+        real_output_path = os.path.realpath(output_path)
+        if real_output_path == os.path.realpath(input_path):
+            parser.error(f"{input_path} would be overwritten; use another --output-dir or a --suffix")
+        if real_output_path in output_sources:
+            parser.error(f"{output_sources[real_output_path]} and {input_path} would both be written to {output_path}")
+        output_sources[real_output_path] = input_path
+        file_jobs.append((
+            input_path, output_path, effect_args,
+            args.select_id, args.select_class, args.select_xpath
+        ))
+
+    for output_directory in sorted({os.path.dirname(file_job[1]) for file_job in file_jobs}):
+        os.makedirs(output_directory, exist_ok=True)
+
+    start_time = time.perf_counter()
+    if job_count > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=job_count) as executor:
+            results = list(executor.map(weather_file, *zip(*file_jobs)))
+    else:
+        results = [weather_file(*file_job) for file_job in file_jobs]
+    total_seconds = time.perf_counter() - start_time
+
+    # Per-file timing summary
+    name_width = max(len(input_path) for input_path, _, _, _ in results)
+    failure_count = 0
+    for input_path, target_count, seconds, error in results:
+        if error is not None:
+            failure_count += 1
+            status = f"FAILED: {error}"
+        elif target_count == 0:
+            status = "no targets, copied unchanged"
+        else:
+            status = f"{target_count} target(s)"
+        print(f"{input_path:<{name_width}}  {seconds:8.3f}s  {status}")
+    print(
+        f"{len(results)} file(s), {failure_count} failed, "
+        f"{total_seconds:.3f}s wall-clock with {job_count} job(s)"
+    )
+    return 1 if failure_count else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())